@@ -0,0 +1,386 @@
+import asyncio
+import contextlib
+import time
+
+from src import live
+from src.events import EventWriter
+from src.feeder import Feeder
+from src.functions import WeightedSampler
+from src.log import Logger
+from src.scheduler import (
+    bounded,
+    client_timeout,
+    run_at_rate,
+    run_loop,
+    run_probes,
+    run_queue,
+    run_stages,
+    warm_up,
+)
+from src.stats import QueryStats, error_category, phase_durations, record_run
+
+
+class Run:
+    """One query run as `Backend.measured` times it."""
+
+    def __init__(self, intended: float | None = None):
+        # The marks the run passes, as perf_counter readings (see stats.marks).
+        self.timestamps: dict[str, float] = {"start": time.perf_counter()}
+        if intended is not None:
+            self.timestamps["intended"] = intended
+        # Set by the backend from what the query returned.
+        self.rows: int = 0
+        self.size: int = 0
+        # Error category of a failed run, and the outcome handed to the
+        # schedulers: phase durations, or {"error": category}.
+        self.error: str | None = None
+        self.durations: dict | None = None
+
+
+class Backend:
+    """
+    Settings every backend shares: output, the run mode and its parameters,
+    warm-up, pooling, the feeder, the workload mix and the event stream. A
+    backend adds its own connection settings, implements `entry` and times
+    every query through `measured`.
+    """
+
+    # Prefix of the per-run error lines in the console output.
+    name: str = "Database"
+
+    def __init__(
+        self,
+        printing: bool = False,
+        print_rows: int = 0,
+        log_level: str = "summary",
+        prefix: str = "",
+        fetch_size: int = 0,
+        rate: float = 0,
+        duration: float = 0,
+        pool: bool = False,
+        pool_min: int = 1,
+        pool_max: int = 10,
+        stages: list[tuple[int, float]] | None = None,
+        iterations: int = 0,
+        warmup_iterations: int = 0,
+        warmup_duration: float = 0,
+        chunk_size: int = 1,
+        max_inflight: int = 0,
+        timeout: float = 0,
+        think_time: float = 0,
+        think_distribution: str = "fixed",
+        feeder: str | None = None,
+        feeder_shard: tuple[int, int] = (0, 1),
+        mix: list[tuple[str, str, float]] | None = None,
+        output: str | None = None,
+        worker_id: int = 0,
+    ):
+        self.printing: bool = printing
+        # Console output goes through a buffered per-process logger; printed
+        # result rows are capped at `print_rows` per file (0 prints them all).
+        self.log: Logger = Logger(log_level, print_rows)
+        self.prefix: str = prefix
+        self.fetch_size: int = fetch_size
+        # Open-loop mode: queries per second for this process, run for
+        # `duration` seconds. 0 keeps the one-shot burst of the whole bucket.
+        self.rate: float = rate
+        self.duration: float = duration
+        # Closed-loop mode (without a rate): each bucket item loops until
+        # `iterations` runs or `duration` seconds, pausing for the think time.
+        self.iterations: int = iterations
+        self.think_time: float = think_time
+        self.think_distribution: str = think_distribution
+        # Warm-up before the measured run: each bucket item repeats its query
+        # `warmup_iterations` times or for `warmup_duration` seconds, and those
+        # runs are left out of the results (tagged `warmup` in --output).
+        self.warmup_iterations: int = warmup_iterations
+        self.warmup_duration: float = warmup_duration
+        self.warming: bool = False
+        # Queue dispatch: queries taken from the shared queue per pull.
+        self.chunk_size: int = chunk_size
+        # Most queries this process keeps in flight at once; the rest wait for
+        # a free slot. 0 runs everything the mode hands out immediately.
+        self.max_inflight: int = max_inflight
+        # Per-query time limit in seconds (0: none). Each backend has the
+        # server enforce it where it can, with a client-side backstop.
+        self.timeout: float = timeout
+        # Concurrency schedule for this process: [(virtual users, seconds)].
+        self.stages: list[tuple[int, float]] | None = stages
+        # Bind parameter rows for queries that declare `-- params:`, read from
+        # this process's shard of the feeder file.
+        self.feeder: Feeder | None = Feeder(feeder, *feeder_shard) if feeder else None
+        # Weighted workload mix: when set, rate/loop/schedule modes draw every
+        # execution's query from it instead of rotating through the bucket.
+        self.sampler: WeightedSampler | None = (
+            WeightedSampler([(f, q) for f, q, _ in mix], [w for _, _, w in mix])
+            if mix
+            else None
+        )
+        # Raw per-run event stream (--output), one part file per worker.
+        self.events: EventWriter | None = (
+            EventWriter(output, worker_id) if output else None
+        )
+        # Pooling mode: sessions are opened once per process, warmed before the
+        # barrier releases and reused by every query, instead of one fresh
+        # connection (and login) per query.
+        self.pool: bool = pool
+        self.pool_min: int = pool_min
+        self.pool_max: int = pool_max
+        # Why the pool could not be opened, if it could not. The worker still
+        # joins the start barrier, and every run fails as a "connect" error,
+        # just as it would connecting on its own without --pool.
+        self.pool_error: str | None = None
+
+    @property
+    def pick(self):
+        return self.sampler.sample if self.sampler else None
+
+    @property
+    def warmup(self) -> bool:
+        return self.warmup_iterations > 0 or self.warmup_duration > 0
+
+    def error_code(self, e: Exception) -> str:
+        """Category of a failed run's exception when it is not a timeout."""
+
+        return type(e).__name__
+
+    @contextlib.contextmanager
+    def measured(self, file_name: str, intended: float | None = None):
+        """
+        Time one run of the query executed in the `with` block and record it:
+        in the live metrics (unless warming up), in the event stream and, when
+        it raises, as a failed run in its error category. The block marks
+        `run.timestamps` and sets `run.rows` and `run.size`; the outcome is
+        `run.durations`.
+        """
+
+        run = Run(intended)
+        # Warm-up runs stay out of the live metrics, as out of the results:
+        # neither the dashboard nor the error-rate abort should see them.
+        measuring = not self.warming
+        if measuring:
+            live.run_started()
+        try:
+            yield run
+            run.timestamps["end"] = time.perf_counter()
+
+            run.durations = phase_durations(run.timestamps)
+            run.durations["rows"], run.durations["bytes"] = run.rows, run.size
+
+        except Exception as e:
+            run.timestamps["end"] = time.perf_counter()
+            run.error = run.error or error_category(
+                run.timestamps, self.error_code(e), self.timeout
+            )
+            run.durations = {"error": run.error}
+            # A client-side timeout has no message of its own.
+            message = str(e) or repr(e)
+            self.log.summary(f"{file_name}: {self.name}-Error ({run.error}): {message}")
+
+        finally:
+            if measuring:
+                live.run_finished(run.durations)
+            if self.events:
+                self.events.record(
+                    file_name,
+                    run.timestamps,
+                    run.rows,
+                    run.size,
+                    run.error,
+                    self.warming,
+                )
+
+    def bind(self, sql_query: str, run: Run) -> dict | None:
+        """
+        The run's parameters from the feeder, if the query declares any. They
+        are drawn before the clock starts: reading the feeder is not query
+        time. A row that does not fit the query fails the run as a "feeder"
+        error.
+        """
+
+        if self.feeder is None:
+            return None
+
+        try:
+            params = self.feeder.bind(sql_query)
+        except ValueError:
+            run.error = "feeder"
+            raise
+        run.timestamps["start"] = time.perf_counter()
+
+        return params
+
+    def pool_warmed(self, start_time: float):
+        self.log.summary(
+            f"Pool warmed: {self.pool_min} connections in "
+            f"{time.monotonic() - start_time:.2f}s"
+        )
+
+    def pool_failed(self, e: Exception):
+        self.pool_error = str(e) or repr(e)
+        self.log.summary(f"Pool could not be opened: {self.pool_error}")
+
+    def check_pool(self):
+        """Fail a run straight away if its --pool could not be opened."""
+
+        if self.pool_error is not None:
+            raise ConnectionError(f"Pool could not be opened: {self.pool_error}")
+
+    def close(self):
+        """Write out the event stream and console output at the end of a job."""
+
+        if self.events:
+            self.events.close()
+        self.log.close()
+
+
+class AsyncBackend(Backend):
+    """
+    A backend whose driver has an asyncio API (Postgres, Oracle, mock): every
+    run is a coroutine on one event loop per process, driven by the shared
+    schedulers. A subclass implements `execute_query`, and `open_pool` and
+    `close_pool` for --pool.
+    """
+
+    @property
+    def deadline(self) -> float | None:
+        # The server should cancel a query at --timeout; the client gives it a
+        # grace period before cancelling on its own.
+        return client_timeout(self.timeout)
+
+    async def open_pool(self):
+        raise NotImplementedError
+
+    async def close_pool(self):
+        pass
+
+    async def execute_query(
+        self,
+        sql_query: str,
+        file_name: str,
+        timestamps: dict[str, float],
+        params: dict | None = None,
+    ) -> tuple[int, int]:
+        raise NotImplementedError
+
+    async def timer(
+        self, sql_query: str, file_name: str, intended: float | None = None
+    ):
+        with self.measured(file_name, intended) as run:
+            params = self.bind(sql_query, run)
+            self.check_pool()
+            # Cancelling the task past the deadline makes the driver cancel
+            # the query server-side.
+            run.rows, run.size = await asyncio.wait_for(
+                self.execute_query(sql_query, file_name, run.timestamps, params),
+                self.deadline,
+            )
+
+        return run.durations
+
+    async def executor(self, bucket: list[tuple[str, str]], timer):
+        # Every query is meant to start right now; however long it waits for
+        # the event loop, or for a free slot under max_inflight, is charged to
+        # its response time.
+        intended = time.perf_counter()
+        tasks = []
+        for file_name, sql in bucket:
+            tasks.append(timer(sql, file_name, intended))
+
+        durations = await asyncio.gather(*tasks)
+
+        # Group durations by file name; a failed run only counts towards its
+        # error category, so the timing stats only reflect successful runs.
+        results: dict[str, QueryStats] = {}
+        for (file_name, _), duration in zip(bucket, durations):
+            if duration is not None:
+                record_run(results, file_name, duration)
+
+        return results
+
+    async def run(
+        self, bucket: list[tuple[str, str]], ready=None, work=None, probe=None
+    ):
+        # Created here, inside the event loop that runs every query.
+        timer = bounded(self.timer, self.max_inflight)
+        # Samples event-loop lag into the live metrics for as long as it runs.
+        watcher = asyncio.create_task(live.watch_loop())
+        try:
+            if self.pool:
+                start_time = time.monotonic()
+                try:
+                    await self.open_pool()
+                    self.pool_warmed(start_time)
+                except Exception as e:
+                    await self.close_pool()
+                    self.pool_failed(e)
+
+            if self.warmup:
+                self.warming = True
+                await warm_up(
+                    timer,
+                    bucket,
+                    self.warmup_iterations,
+                    self.warmup_duration,
+                    self.pick,
+                    self.log.summary,
+                )
+                self.warming = False
+
+            # Block on the barrier (if any) only once the pool and the caches
+            # are warm, so neither is part of the measured run.
+            if ready:
+                await asyncio.to_thread(ready)
+
+            if probe:
+                return await run_probes(
+                    timer,
+                    bucket,
+                    probe,
+                    self.rate > 0,
+                    self.think_time,
+                    self.think_distribution,
+                    self.pick,
+                )
+
+            if work:
+                # As many slots as this process's static share of the runs, so
+                # the in-flight load matches static dispatch; max_inflight
+                # still caps it through the timer.
+                return await run_queue(timer, work, len(bucket))
+
+            if self.stages:
+                return await run_stages(
+                    timer,
+                    bucket,
+                    self.stages,
+                    self.think_time,
+                    self.think_distribution,
+                    self.pick,
+                )
+
+            if self.rate > 0:
+                return await run_at_rate(
+                    timer, bucket, self.rate, self.duration, self.pick
+                )
+
+            if self.iterations > 0 or self.duration > 0:
+                return await run_loop(
+                    timer,
+                    bucket,
+                    self.iterations,
+                    self.duration,
+                    self.think_time,
+                    self.think_distribution,
+                    self.pick,
+                )
+
+            return await self.executor(bucket, timer)
+
+        finally:
+            watcher.cancel()
+            await self.close_pool()
+            self.close()
+
+    def entry(self, bucket: list[tuple[str, str]], ready=None, work=None, probe=None):
+        return asyncio.run(self.run(bucket, ready, work, probe))
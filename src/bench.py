@@ -0,0 +1,130 @@
+import argparse
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from src.functions import build_buckets, resolve_process_count
+from src.main import run_workers
+from src.mock_db import MockDB
+from src.stats import QueryStats, overall_stats
+
+# The single synthetic query every benchmark cell runs.
+bench_query: tuple[str, str] = ("bench.sql", "SELECT 1")
+
+
+def arguments(argv: list[str]) -> argparse.Namespace:
+    cpu = resolve_process_count(0)
+    default_processes = sorted({1, *[2**i for i in range(1, cpu.bit_length())], cpu})
+
+    parser = argparse.ArgumentParser(
+        prog="main.py bench",
+        description="Benchmark the load generator itself against the mock "
+        "backend: maximum sustainable QPS and per-query overhead/jitter for "
+        "each process count.",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        nargs="+",
+        default=default_processes,
+        help="Process counts to benchmark (default powers of two up to CPU count)",
+    )
+    parser.add_argument(
+        "--users",
+        type=int,
+        default=100,
+        help="Closed-loop virtual users per process (default 100)",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=5,
+        help="Seconds per measurement (default 5)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.01,
+        help="Fixed simulated query latency for the overhead measurement "
+        "(default 0.01)",
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=0,
+        help="Rows each simulated query returns (default 0)",
+    )
+    parser.add_argument(
+        "--fetch_size",
+        type=int,
+        default=0,
+        help="Fetch batch size for the simulated rows (default 0, no fetch)",
+    )
+    return parser.parse_args(argv)
+
+
+@contextmanager
+def silenced():
+    """
+    Point file descriptor 1 at /dev/null, for this process and any worker it
+    spawns. Workers log at the default summary level, so there are no per-run
+    lines to measure; this keeps their one-off lines off the bench table.
+    """
+
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, 1)
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(devnull)
+        os.close(saved)
+
+
+def measure(args: argparse.Namespace, processes: int, latency: float) -> QueryStats:
+    """Run one closed-loop cell on the mock backend; return the merged stats."""
+
+    buckets = build_buckets([bench_query], args.users * processes, processes)
+    db_kwargs = {
+        "latency": latency,
+        "rows": args.rows,
+        "fetch_size": args.fetch_size,
+        "duration": args.duration,
+    }
+
+    with silenced():
+        results, _ = run_workers(MockDB, db_kwargs, buckets, dashboard=False)
+
+    return overall_stats(results)
+
+
+def main(argv: list[str]) -> None:
+    args = arguments(argv)
+
+    print(
+        f"{'Processes':>9}{'Users':>8}{'Max QPS':>11}{'QPS/proc':>10}"
+        f"{'Overhead p50':>14}{'p99':>10}{'p99.9':>10}{'Startup':>9}"
+    )
+    for processes in args.processes:
+        # Throughput ceiling: zero simulated latency, so every microsecond of
+        # a run is harness (scheduling, timing, bookkeeping).
+        start_time = time.monotonic()
+        ceiling = measure(args, processes, 0.0)
+        startup = time.monotonic() - start_time - args.duration
+        qps = ceiling.runs / args.duration
+
+        # Jitter: with a fixed simulated latency, everything above it is time
+        # the harness added between the query finishing and being timed.
+        timed = measure(args, processes, args.latency).phases["total"]
+        overhead = [(timed.percentile(q) - args.latency) * 1000 for q in (50, 99, 99.9)]
+
+        print(
+            f"{processes:>9}{args.users * processes:>8}{qps:>11.0f}"
+            f"{qps / processes:>10.0f}"
+            f"{overhead[0]:>12.2f}ms{overhead[1]:>8.2f}ms{overhead[2]:>8.2f}ms"
+            f"{startup:>8.2f}s"
+        )
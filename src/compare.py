@@ -0,0 +1,170 @@
+import argparse
+
+from src import events
+from src.stats import (
+    QueryStats,
+    mann_whitney,
+    marks,
+    overall_stats,
+    percentiles,
+    phase_durations,
+    record_run,
+)
+
+
+class ResultSet:
+    """
+    One saved --output file folded back into per-file stats: the successful
+    runs as {file_name: QueryStats} and the failed runs per file. Warm-up runs
+    are left out, as in the report of the run itself.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.results: dict[str, QueryStats] = {}
+        self.errors: dict[str, int] = {}
+
+        for event in events.read(path):
+            if event["warmup"]:
+                continue
+
+            file_name = event["file"]
+            if event["error"] is not None or event["end"] is None:
+                self.errors[file_name] = self.errors.get(file_name, 0) + 1
+                continue
+
+            timestamps = {
+                mark: event[mark] for mark in marks if event[mark] is not None
+            }
+            durations = phase_durations(timestamps)
+            durations["rows"], durations["bytes"] = event["rows"], event["bytes"]
+            record_run(self.results, file_name, durations, timestamps["end"])
+
+
+def arguments(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="main.py compare",
+        description="Compare two --output event files per query file and exit "
+        "non-zero if the candidate's latency regressed.",
+    )
+    parser.add_argument("baseline", help="Event file of the baseline run")
+    parser.add_argument("candidate", help="Event file of the candidate run")
+    parser.add_argument(
+        "--percentile",
+        type=float,
+        default=99,
+        help="Response time percentile the regression gate checks (default 99)",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10,
+        help="Percent increase of that percentile counted as a regression, if "
+        "also statistically significant (default 10)",
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        help="Significance level of the Mann-Whitney U test (default 0.05)",
+    )
+    return parser.parse_args(argv)
+
+
+def change(before: float, after: float) -> str:
+    if before == 0:
+        return f"{'':>9}" if after == 0 else f"{'new':>9}"
+
+    return f"{(after - before) / before:>+9.1%}"
+
+
+def compare_stats(
+    args: argparse.Namespace,
+    before: QueryStats,
+    after: QueryStats,
+    errors: tuple[int, int],
+    indent: str = "  ",
+) -> bool:
+    """
+    Print throughput and response time percentiles of one query file (or the
+    overall roll-up) side by side. Returns True if it regressed.
+    """
+
+    response_before = before.phases["response"]
+    response_after = after.phases["response"]
+
+    print(f"{indent}{'Metric':<10}{'Baseline':>11}{'Candidate':>11}{'Change':>9}")
+    print(
+        f"{indent}{'Runs':<10}{before.runs:>11}{after.runs:>11}"
+        f"{change(before.runs, after.runs)}"
+    )
+    print(f"{indent}{'Errors':<10}{errors[0]:>11}{errors[1]:>11}{change(*errors)}")
+    qps = (before.per_second(before.runs), after.per_second(after.runs))
+    print(f"{indent}{'QPS':<10}{qps[0]:>11.1f}{qps[1]:>11.1f}{change(*qps)}")
+    for q in percentiles:
+        values = (response_before.percentile(q), response_after.percentile(q))
+        print(
+            f"{indent}{f'p{q:g}':<10}{values[0]:>10.3f}s{values[1]:>10.3f}s"
+            f"{change(*values)}"
+        )
+
+    if not before.runs:
+        print(f"{indent}Not in baseline")
+        return False
+    if not after.runs:
+        print(f"{indent}REGRESSION: no successful runs in candidate")
+        return True
+
+    p_value = mann_whitney(response_before, response_after)
+    gate_before = response_before.percentile(args.percentile)
+    gate_after = response_after.percentile(args.percentile)
+    increase = (gate_after - gate_before) / gate_before if gate_before else 0.0
+
+    regressed = increase * 100 > args.threshold and p_value < args.alpha
+    verdict = (
+        f"REGRESSION: p{args.percentile:g} {increase:+.1%}"
+        if regressed
+        else "no regression"
+    )
+    print(f"{indent}Mann-Whitney p = {p_value:.4f}, {verdict}")
+
+    return regressed
+
+
+def main(argv: list[str]) -> int:
+    args = arguments(argv)
+    baseline = ResultSet(args.baseline)
+    candidate = ResultSet(args.candidate)
+
+    names = set()
+    for result_set in (baseline, candidate):
+        names |= result_set.results.keys() | result_set.errors.keys()
+
+    regressions = []
+    for file_name in sorted(names):
+        print(f"\n{file_name}")
+        if compare_stats(
+            args,
+            baseline.results.get(file_name, QueryStats()),
+            candidate.results.get(file_name, QueryStats()),
+            (baseline.errors.get(file_name, 0), candidate.errors.get(file_name, 0)),
+        ):
+            regressions.append(file_name)
+
+    print(f"\n{'=' * 41}")
+    print("Overall")
+    if compare_stats(
+        args,
+        overall_stats(baseline.results),
+        overall_stats(candidate.results),
+        (sum(baseline.errors.values()), sum(candidate.errors.values())),
+        indent="",
+    ):
+        regressions.append("overall")
+    print(f"{'=' * 41}")
+
+    if regressions:
+        print(f"Regressed: {', '.join(regressions)}")
+        return 1
+
+    return 0
@@ -1,127 +1,445 @@
+import asyncio
+import math
+import queue
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from databricks import sql
-from src.functions import future_thread_executor
+from src import live
+from src.backend import Backend
+from src.scheduler import (
+    client_timeout,
+    run_loop,
+    run_probes,
+    run_queue,
+    run_stages,
+    warm_up,
+)
+from src.stats import QueryStats, estimate_bytes, record_run
 
 # Print a progress heartbeat every N fetched batches when fetch_size > 0.
 progress_every: int = 5
 
+# Most threads one process may need for a --find_max concurrency probe.
+probe_threads: int = 4096
+
+# Warehouse errors carry no code attribute, only their message, which names
+# the SQLSTATE ("... SQLSTATE: 42P01") and usually leads with the error class.
+_sqlstate_pattern = re.compile(r"SQLSTATE: ([0-9A-Z]{5})")
+_error_class_pattern = re.compile(r"^\[([A-Z_.]+)\]")
+
+
+def databricks_code(e: Exception) -> str:
+    """SQLSTATE or error class of a warehouse error, else the exception type."""
+
+    message = str(e) if isinstance(e, sql.exc.Error) else ""
+    match = _sqlstate_pattern.search(message) or _error_class_pattern.match(message)
+
+    return match.group(1) if match else type(e).__name__
+
+
+class ConnectionSet:
+    """
+    Minimal thread-safe pool of open Databricks connections for one process.
+
+    The connector has no pool of its own. `min_size` connections are opened up
+    front; more are opened on demand up to `max_size`, after which callers
+    block until a connection is handed back.
+    """
+
+    def __init__(self, connect, min_size: int, max_size: int):
+        self.connect = connect
+        self.max_size: int = max(max_size, min_size, 1)
+        self.idle: queue.Queue = queue.Queue()
+        self.opened: int = 0
+        self.lock = threading.Lock()
+
+        try:
+            for _ in range(min_size):
+                self.idle.put(self.connect())
+                self.opened += 1
+        except Exception:
+            self.close()
+            raise
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            grow = self.opened < self.max_size
+            if grow:
+                self.opened += 1
+
+        if grow:
+            try:
+                return self.connect()
+            except Exception:
+                with self.lock:
+                    self.opened -= 1
+                raise
+
+        return self.idle.get()
+
+    def release(self, connection):
+        self.idle.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class DatabricksDB(Backend):
+    name: str = "Databricks"
 
-class DatabricksDB:
     def __init__(
         self,
         server_hostname: str,
         http_path: str,
         access_token: str,
-        printing: bool = False,
-        prefix: str = "",
-        fetch_size: int = 0,
+        arrow: bool = False,
+        **kwargs,
     ):
+        super().__init__(**kwargs)
         self.server_hostname: str = server_hostname
         self.http_path: str = http_path
         self.access_token: str = access_token
-        self.printing: bool = printing
-        self.prefix: str = prefix
-        self.fetch_size: int = fetch_size
+        # Columnar fetch: drain results as Arrow tables and only count them,
+        # never building a Python object per row.
+        self.arrow: bool = arrow
+        self.threads: ThreadPoolExecutor | None = None
+        self.conn_pool: ConnectionSet | None = None
+
+    def open_pool(self):
+        self.conn_pool = ConnectionSet(
+            self.new_connection, self.pool_min, self.pool_max
+        )
+
+    def new_connection(self):
+        # --timeout is enforced by the warehouse as the session's
+        # STATEMENT_TIMEOUT and, as a backstop, by cancelling the cursor from
+        # a watchdog timer in `execute_query`.
+        return sql.connect(
+            server_hostname=self.server_hostname,
+            http_path=self.http_path,
+            access_token=self.access_token,
+            session_configuration=(
+                {"STATEMENT_TIMEOUT": str(math.ceil(self.timeout))}
+                if self.timeout > 0
+                else None
+            ),
+        )
+
+    def connect(self):
+        if self.conn_pool:
+            return self.conn_pool.acquire()
+
+        return self.new_connection()
+
+    def disconnect(self, connection):
+        if self.conn_pool:
+            self.conn_pool.release(connection)
+        else:
+            connection.close()
+
+    def queue_depth(self) -> int:
+        # Runs handed to the current thread pool that are still waiting for a
+        # thread. The executor keeps no public count, so read its work queue.
+        threads = self.threads
+        return threads._work_queue.qsize() if threads is not None else 0
+
+    def thread_count(self, wanted: int) -> int:
+        # Every mode's thread pool is capped at max_inflight threads, and the
+        # remaining work queues for one. 0 gives every virtual user or query
+        # its own thread.
+        wanted = max(wanted, 1)
+        if self.max_inflight > 0:
+            return min(wanted, self.max_inflight)
+
+        return wanted
+
+    def fetch_arrow(self, cursor, timestamps: dict[str, float]) -> tuple[int, int]:
+        # Results arrive from the warehouse as Arrow already; take them as
+        # tables and only count them instead of converting to Row objects.
+        rows_fetched = 0
+        bytes_fetched = 0
+        while True:
+            if self.fetch_size > 0:
+                table = cursor.fetchmany_arrow(self.fetch_size)
+            else:
+                table = cursor.fetchall_arrow()
+
+            if "first_row" not in timestamps:
+                timestamps["first_row"] = time.perf_counter()
+
+            if not table.num_rows:
+                break
+
+            rows_fetched += table.num_rows
+            bytes_fetched += table.nbytes
+            if self.fetch_size < 0:
+                break
 
-    def execute_query(self, sql_query: str, file_name: str):
+        timestamps["fetched"] = time.perf_counter()
+
+        return rows_fetched, bytes_fetched
+
+    def execute_query(
+        self,
+        sql_query: str,
+        file_name: str,
+        timestamps: dict[str, float],
+        params: dict | None = None,
+    ):
         connection = None
+        watchdog = None
         sql_query = f"{self.prefix}\n{sql_query}"
 
         try:
-            connection = sql.connect(
-                server_hostname=self.server_hostname,
-                http_path=self.http_path,
-                access_token=self.access_token,
-            )
+            connection = self.connect()
 
             if not connection:
                 raise Exception(f"{file_name}: Could not connect to the database")
             else:
-                print(f"{file_name}: Connected")
+                self.log.verbose(f"{file_name}: Connected")
+            timestamps["connected"] = time.perf_counter()
 
             with connection.cursor() as cursor:
-                cursor.execute(sql_query)
+                deadline = client_timeout(self.timeout)
+                if deadline is not None:
+                    # Runs on its own thread; cancels the statement, which
+                    # makes the blocked execute or fetch below raise.
+                    watchdog = threading.Timer(deadline, cursor.cancel)
+                    watchdog.daemon = True
+                    watchdog.start()
+
+                # Native named parameters (:name). The connector has no client
+                # side prepare step to toggle.
+                cursor.execute(sql_query, parameters=params)
+                timestamps["executed"] = time.perf_counter()
+
+                if self.arrow:
+                    return self.fetch_arrow(cursor, timestamps)
 
                 rows_fetched = 0
+                bytes_fetched = 0
                 if self.fetch_size > 0:
                     batches = 0
                     while True:
                         rows = cursor.fetchmany(self.fetch_size)
 
+                        if batches == 0:
+                            timestamps["first_row"] = time.perf_counter()
+
                         if not rows:
                             break
 
                         rows_fetched += len(rows)
+                        bytes_fetched += estimate_bytes(rows)
                         batches += 1
 
                         # Heartbeat so a long-running fetch is visibly still
                         # making progress (vs genuinely stuck).
                         if batches % progress_every == 0:
                             now = datetime.now().strftime("%H:%M:%S")
-                            print(
+                            self.log.verbose(
                                 f"[{now}] {file_name}: still fetching... "
                                 f"{rows_fetched} rows so far"
                             )
 
                         if self.printing:
-                            for row in rows:
-                                print(row)
+                            self.log.rows(file_name, rows)
 
                 elif self.fetch_size == -1:
                     rows = cursor.fetchall()
+                    timestamps["first_row"] = time.perf_counter()
 
                     rows_fetched = len(rows)
+                    bytes_fetched = estimate_bytes(rows)
 
                     if self.printing:
-                        for row in rows:
-                            print(row)
+                        self.log.rows(file_name, rows)
 
                 else:
                     # No-fetch mode. Databricks/Spark is lazy and streaming, and
                     # there is no scrollable-cursor "jump to last" or forward.
                     raise Exception("Databricks does not support fetch_size 0")
 
+                timestamps["fetched"] = time.perf_counter()
+
                 if rows_fetched > 0:
-                    print(f"{file_name}: Rows fetched: {rows_fetched}")
+                    self.log.verbose(f"{file_name}: Rows fetched: {rows_fetched}")
+
+                return rows_fetched, bytes_fetched
 
         finally:
+            if watchdog:
+                watchdog.cancel()
             if connection:
-                connection.close()
-
-    def timer(self, sql_query: str, file_name: str):
-        try:
-            start_time = time.monotonic()
-            self.execute_query(sql_query, file_name)
-            end_time = time.monotonic()
+                self.disconnect(connection)
 
-            return file_name, end_time - start_time
+    def error_code(self, e: Exception) -> str:
+        return databricks_code(e)
 
-        except Exception as e:
-            print(f"{file_name}: Databricks-Error: {e}")
-            return file_name, None
+    def timer(self, sql_query: str, file_name: str, intended: float | None = None):
+        with self.measured(file_name, intended) as run:
+            params = self.bind(sql_query, run)
+            self.check_pool()
+            run.rows, run.size = self.execute_query(
+                sql_query, file_name, run.timestamps, params
+            )
 
-    def executor(self, bucket: list[tuple[str, str]]):
-        # One thread per query in the bucket (override_threads) so they all fire
-        # in parallel. Each arg is [callable, *positional_args] for the executor.
-        args = [[self.timer, sql, file_name] for file_name, sql in bucket]
+        return run.durations
 
-        thread_results = future_thread_executor(
-            args, threads=len(bucket), override_threads=True
+    async def timer_async(
+        self, sql_query: str, file_name: str, intended: float | None = None
+    ):
+        # Awaitable wrapper so the shared asyncio schedulers can drive the
+        # blocking connector: each run occupies one thread of `self.threads`,
+        # and time spent queued for a thread counts towards its response time.
+        if intended is None:
+            intended = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.threads, self.timer, sql_query, file_name, intended
         )
 
-        # Each result is (file_name, duration|None). Group successful runs by
-        # file name; drop None (errored or thread-level failure).
-        results: dict[str, list[float]] = {}
-        for item in thread_results:
-            if item is None:
-                continue
-            file_name, duration = item
-            if duration is not None:
-                results.setdefault(file_name, []).append(duration)
+    def stage_executor(self, bucket: list[tuple[str, str]]):
+        # One thread per virtual user at the busiest stage; a user holds its
+        # thread only for the duration of each query.
+        peak = max(concurrency for concurrency, _ in self.stages)
+        with ThreadPoolExecutor(max_workers=self.thread_count(peak)) as self.threads:
+            return asyncio.run(
+                run_stages(
+                    self.timer_async,
+                    bucket,
+                    self.stages,
+                    self.think_time,
+                    self.think_distribution,
+                    self.pick,
+                )
+            )
+
+    def loop_executor(self, bucket: list[tuple[str, str]]):
+        # One thread per virtual user, i.e. per bucket item.
+        workers = self.thread_count(len(bucket))
+        with ThreadPoolExecutor(max_workers=workers) as self.threads:
+            return asyncio.run(
+                run_loop(
+                    self.timer_async,
+                    bucket,
+                    self.iterations,
+                    self.duration,
+                    self.think_time,
+                    self.think_distribution,
+                    self.pick,
+                )
+            )
+
+    def executor(self, bucket: list[tuple[str, str]]):
+        # One thread per query in the bucket so they all fire in parallel, or
+        # max_inflight threads that the rest queue for (sampled as the backlog).
+        # All are meant to start now; thread start-up and queueing delay count
+        # as wait.
+        intended = time.perf_counter()
+        workers = self.thread_count(len(bucket))
+        with ThreadPoolExecutor(max_workers=workers) as self.threads:
+            futures = [
+                self.threads.submit(self.timer, sql, file_name, intended)
+                for file_name, sql in bucket
+            ]
+
+        # Group runs by file name; failed runs only count towards their error
+        # category. A run that raised outside the timer counts by its type.
+        results: dict[str, QueryStats] = {}
+        for (file_name, _), future in zip(bucket, futures):
+            error = future.exception()
+            durations = {"error": type(error).__name__} if error else future.result()
+            record_run(results, file_name, durations)
 
         return results
 
-    def entry(self, bucket: list[tuple[str, str]]):
-        return self.executor(bucket)
+    def queue_executor(self, bucket: list[tuple[str, str]], work):
+        # One slot per query of this process's static share, as in the
+        # one-shot mode, each on its own thread (or max_inflight threads);
+        # a slot pulls its next query as soon as it is free.
+        workers = self.thread_count(len(bucket))
+        with ThreadPoolExecutor(max_workers=workers) as self.threads:
+            return asyncio.run(run_queue(self.timer_async, work, len(bucket)))
+
+    def probe_executor(self, bucket: list[tuple[str, str]], probe):
+        # Threads start lazily, so the cap only bounds the largest probe.
+        workers = self.thread_count(probe_threads)
+        with ThreadPoolExecutor(max_workers=workers) as self.threads:
+            return asyncio.run(
+                run_probes(
+                    self.timer_async,
+                    bucket,
+                    probe,
+                    think_time=self.think_time,
+                    think_distribution=self.think_distribution,
+                    pick=self.pick,
+                )
+            )
+
+    def entry(self, bucket: list[tuple[str, str]], ready=None, work=None, probe=None):
+        # No event loop of its own to lag; the thread pool's backlog is the
+        # client-side signal instead.
+        live.watch_threads(self.queue_depth)
+        try:
+            if self.pool:
+                start_time = time.monotonic()
+                try:
+                    self.open_pool()
+                    self.pool_warmed(start_time)
+                except Exception as e:
+                    self.pool_failed(e)
+
+            if self.warmup:
+                self.warming = True
+                workers = self.thread_count(len(bucket))
+                with ThreadPoolExecutor(max_workers=workers) as self.threads:
+                    asyncio.run(
+                        warm_up(
+                            self.timer_async,
+                            bucket,
+                            self.warmup_iterations,
+                            self.warmup_duration,
+                            self.pick,
+                            self.log.summary,
+                        )
+                    )
+                self.warming = False
+
+            # Block on the barrier (if any) only once the pool and the caches
+            # are warm, so neither is part of the measured run.
+            if ready:
+                ready()
+
+            if probe:
+                return self.probe_executor(bucket, probe)
+
+            if work:
+                return self.queue_executor(bucket, work)
+
+            if self.stages:
+                return self.stage_executor(bucket)
+
+            if self.iterations > 0 or self.duration > 0:
+                return self.loop_executor(bucket)
+
+            return self.executor(bucket)
+
+        finally:
+            if self.conn_pool:
+                self.conn_pool.close()
+                self.conn_pool = None
+            self.close()
@@ -0,0 +1,218 @@
+import argparse
+import os
+import tempfile
+import time
+from multiprocessing.connection import Client, Listener
+
+from src import events
+from src.stats import merge_results, merge_stage_results
+
+# Seconds between the coordinator sending the start signal and the agreed
+# start moment: enough for the message to reach every agent. Agents' clocks
+# must be NTP-synchronized well within this.
+start_delay: float = 2.0
+
+# Shared secret that authenticates coordinator and agents to each other. Jobs
+# are pickled, so an agent must never accept one from an unauthenticated peer.
+key_variable: str = "LOADTEST_AGENT_KEY"
+
+# Bytes per message when an agent sends its --output events back.
+events_chunk: int = 1 << 20
+
+
+def parse_address(text: str) -> tuple[str, int]:
+    host, _, port = text.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"{text}: expected HOST:PORT")
+
+    return host, int(port)
+
+
+def agent_key(key: str | None) -> bytes:
+    key = key or os.environ.get(key_variable)
+    if not key:
+        raise ValueError(
+            f"Agents need a shared key: pass --agent_key or set {key_variable}"
+        )
+
+    return key.encode()
+
+
+def scratch_path(output: str, tag: str) -> str:
+    """
+    A new, uniquely named file next to `output` (same format), so agents and
+    a coordinator sharing one host never write to the same file.
+    """
+
+    root, extension = os.path.splitext(output)
+    fd, path = tempfile.mkstemp(
+        suffix=extension,
+        prefix=f"{os.path.basename(root)}.{tag}.",
+        dir=os.path.dirname(output) or ".",
+    )
+    os.close(fd)
+
+    return path
+
+
+def send_events(conn, path: str) -> None:
+    """Stream an agent's combined event file to the coordinator, then drop it."""
+
+    with open(path, "rb") as file:
+        while chunk := file.read(events_chunk):
+            conn.send(("events", chunk))
+    os.remove(path)
+
+
+def serve(address: tuple[str, int], key: bytes) -> None:
+    """
+    Agent loop: accept one coordinator at a time and run its job on this host's
+    worker pool, forever.
+
+    A job is (payloads, abort_error_rate, stages, output, start_method). Once
+    every local worker is ready the agent says so and waits for the
+    coordinator's start moment, then releases its barrier and finally sends
+    back its --output events, if any, and its results.
+    """
+
+    # Imported here, as src.main imports this module for `coordinate`.
+    from src.main import run_payloads
+
+    with Listener(address, authkey=key) as listener:
+        print(f"Agent listening on {address[0]}:{address[1]}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                print(f"Rejected connection: {e}")
+                continue
+
+            with conn:
+
+                def start():
+                    conn.send(("ready",))
+                    _, start_at = conn.recv()
+                    time.sleep(max(start_at - time.time(), 0))
+
+                combined = None
+                try:
+                    payloads, abort_error_rate, stages, output, method = conn.recv()
+                    print(f"Job received: {len(payloads)} workers")
+                    # The workers' parts are combined into a file of this
+                    # agent's own, which goes back to the coordinator.
+                    combined = scratch_path(output, "agent") if output else None
+                    results, aborted = run_payloads(
+                        payloads,
+                        abort_error_rate,
+                        stages,
+                        True,
+                        combined,
+                        start,
+                        start_method=method,
+                    )
+                    if combined:
+                        send_events(conn, combined)
+                    conn.send(("done", results, aborted))
+                    print("Job finished")
+                except Exception as e:
+                    # Includes the coordinator going away mid-job.
+                    print(f"Job failed: {e!r}")
+                    try:
+                        conn.send(("error", repr(e)))
+                    except OSError:
+                        pass
+                finally:
+                    if combined and os.path.exists(combined):
+                        os.remove(combined)
+
+
+def coordinate(
+    agents: list[str],
+    key: bytes,
+    payloads: list,
+    abort_error_rate: float = 0,
+    stages: list[tuple[int, float]] | None = None,
+    output: str | None = None,
+    start_method: str = "spawn",
+):
+    """
+    Deal the worker payloads round-robin across the agents, start them all at
+    one wall-clock moment and merge what they send back. With `output`, each
+    agent's events are received into a file here and all of them combined
+    into `output` on this host.
+
+    :return: (results, aborted) as from `run_workers`; aborted if any agent
+        aborted
+    """
+
+    connections = [Client(parse_address(agent), authkey=key) for agent in agents]
+    parts: list[str] = []
+    try:
+        for index, conn in enumerate(connections):
+            share = payloads[index :: len(connections)]
+            conn.send((share, abort_error_rate, stages, output, start_method))
+
+        # Same role as the local Barrier, across hosts: nobody starts until
+        # every agent's workers are up, then all start at the same moment.
+        for agent, conn in zip(agents, connections):
+            message = conn.recv()
+            if message[0] == "error":
+                raise RuntimeError(f"{agent}: {message[1]}")
+        print(f"All {len(agents)} agents ready")
+
+        start_at = time.time() + start_delay
+        for conn in connections:
+            conn.send(("start", start_at))
+
+        if stages:
+            results = [{} for _ in stages]
+            merge = merge_stage_results
+        else:
+            results = {}
+            merge = merge_results
+
+        aborted = False
+        for agent, conn in zip(agents, connections):
+            part = scratch_path(output, "part") if output else None
+            if part:
+                parts.append(part)
+            with open(part or os.devnull, "wb") as file:
+                while (message := conn.recv())[0] == "events":
+                    file.write(message[1])
+            if message[0] == "error":
+                raise RuntimeError(f"{agent}: {message[1]}")
+            _, agent_results, agent_aborted = message
+            merge(results, agent_results)
+            aborted = aborted or agent_aborted
+
+        if output:
+            events.combine(output, parts)
+
+        return results, aborted
+
+    finally:
+        for conn in connections:
+            conn.close()
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="main.py agent",
+        description="Run load-test workers on this host for a remote "
+        "coordinator (main.py --agents ...).",
+    )
+    parser.add_argument(
+        "--listen",
+        default="0.0.0.0:7878",
+        help="HOST:PORT to accept the coordinator on (default 0.0.0.0:7878)",
+    )
+    parser.add_argument(
+        "--agent_key",
+        help=f"Shared secret, also read from ${key_variable}",
+    )
+    args = parser.parse_args(argv)
+
+    serve(parse_address(args.listen), agent_key(args.agent_key))
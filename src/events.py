@@ -0,0 +1,233 @@
+import csv
+import json
+import os
+import shutil
+import threading
+import time
+
+from src.stats import marks
+
+# Events buffered per worker before a chunk is written out. Bounds memory
+# however long the run is, and gives Parquet row groups a sensible size.
+chunk_rows: int = 10_000
+
+# One event per run: the query file, the worker that ran it, every mark as a
+# wall-clock Unix timestamp (empty when the run never reached it), rows and
+# estimated bytes fetched, the error code of a failed run, and whether it ran
+# during the warm-up (and so is not part of the measurement).
+columns: tuple[str, ...] = (
+    "file",
+    "worker",
+    *marks,
+    "rows",
+    "bytes",
+    "error",
+    "warmup",
+)
+
+formats: dict[str, str] = {
+    ".parquet": "parquet",
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+
+
+def output_format(path: str) -> str:
+    """File format for an --output path, from its extension."""
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in formats:
+        raise ValueError(f"{path}: --output must end in .parquet, .csv or .jsonl")
+
+    return formats[extension]
+
+
+def arrow_schema():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError("Parquet output requires pyarrow (pip install pyarrow)")
+
+    return pa.schema(
+        [
+            ("file", pa.string()),
+            ("worker", pa.int32()),
+            *[(mark, pa.float64()) for mark in marks],
+            ("rows", pa.int64()),
+            ("bytes", pa.int64()),
+            ("error", pa.string()),
+            ("warmup", pa.bool_()),
+        ]
+    )
+
+
+def part_path(path: str, worker_id: int) -> str:
+    """Where worker `worker_id` streams its own events before `combine`."""
+
+    root, extension = os.path.splitext(path)
+    return f"{root}.part{worker_id}{extension}"
+
+
+class EventWriter:
+    """
+    Per-process stream of raw run events into one file (CSV, JSONL or Parquet).
+
+    Events are appended to an in-memory chunk and written out every
+    `chunk_rows`, so only one chunk is ever held. The Databricks backend
+    records from many threads at once, hence the lock.
+    """
+
+    def __init__(self, path: str, worker_id: int = 0):
+        self.path: str = path
+        self.worker_id: int = worker_id
+        self.format: str = output_format(path)
+        self.lock = threading.Lock()
+        self.chunk: list[tuple] = []
+        self.file = None
+        self.writer = None
+        # perf_counter has an arbitrary per-process origin; shift every mark
+        # onto the wall clock so events from different workers line up.
+        self.epoch: float = time.time() - time.perf_counter()
+
+    def record(
+        self,
+        file_name: str,
+        timestamps: dict[str, float],
+        rows: int = 0,
+        size: int = 0,
+        error: str | None = None,
+        warmup: bool = False,
+    ):
+        event = (
+            file_name,
+            self.worker_id,
+            *[
+                timestamps[mark] + self.epoch if mark in timestamps else None
+                for mark in marks
+            ],
+            rows,
+            size,
+            error,
+            warmup,
+        )
+
+        with self.lock:
+            self.chunk.append(event)
+            if len(self.chunk) >= chunk_rows:
+                self.write()
+
+    def open(self):
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+
+            self.writer = pq.ParquetWriter(self.path, arrow_schema())
+        else:
+            self.file = open(self.path, "w", newline="")
+            if self.format == "csv":
+                self.writer = csv.writer(self.file)
+                self.writer.writerow(columns)
+
+    def write(self):
+        if self.writer is None and self.file is None:
+            self.open()
+
+        if self.format == "parquet":
+            import pyarrow as pa
+
+            schema = arrow_schema()
+            self.writer.write_table(
+                pa.Table.from_arrays(
+                    [
+                        pa.array([event[i] for event in self.chunk], field.type)
+                        for i, field in enumerate(schema)
+                    ],
+                    schema=schema,
+                )
+            )
+        elif self.format == "csv":
+            self.writer.writerows(self.chunk)
+        else:
+            for event in self.chunk:
+                self.file.write(json.dumps(dict(zip(columns, event))) + "\n")
+
+        self.chunk = []
+
+    def close(self):
+        """Write out the last partial chunk and close the file."""
+
+        with self.lock:
+            if self.chunk or (self.writer is None and self.file is None):
+                self.write()
+            if self.format == "parquet":
+                self.writer.close()
+            else:
+                self.file.close()
+
+
+def read(path: str):
+    """
+    Yield the events of an --output file back as {column: value} dicts, with
+    missing marks and errors as None, one chunk in memory at a time.
+    """
+
+    output = output_format(path)
+
+    if output == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield from batch.to_pylist()
+    elif output == "csv":
+        with open(path, newline="") as file:
+            for record in csv.DictReader(file):
+                event = {"file": record["file"], "worker": int(record["worker"])}
+                for mark in marks:
+                    event[mark] = float(record[mark]) if record[mark] else None
+                event["rows"] = int(record["rows"])
+                event["bytes"] = int(record["bytes"])
+                event["error"] = record["error"] or None
+                event["warmup"] = record["warmup"] == "True"
+                yield event
+    else:
+        with open(path) as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def combine(path: str, parts: list[str]) -> None:
+    """
+    Concatenate the per-worker part files into `path` and delete them,
+    streaming chunk by chunk so memory stays bounded.
+    """
+
+    parts = [part for part in parts if os.path.exists(part)]
+    output = output_format(path)
+
+    if output == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        with pq.ParquetWriter(path, arrow_schema()) as writer:
+            for part in parts:
+                try:
+                    reader = pq.ParquetFile(part)
+                except pa.ArrowInvalid:
+                    # A worker terminated by --abort_error_rate never got to
+                    # write its file footer; its events are lost.
+                    continue
+                for group in range(reader.num_row_groups):
+                    writer.write_table(reader.read_row_group(group))
+    else:
+        with open(path, "w", newline="") as target:
+            for index, part in enumerate(parts):
+                with open(part, newline="") as source:
+                    if output == "csv":
+                        header = source.readline()
+                        if index == 0:
+                            target.write(header)
+                    shutil.copyfileobj(source, target)
+
+    for part in parts:
+        os.remove(part)
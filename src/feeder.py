@@ -0,0 +1,109 @@
+import csv
+import functools
+import itertools
+import json
+import os
+import re
+import threading
+
+# A .sql file declares its bind parameters in a header comment, in the order a
+# positional driver (Postgres $1, $2, ...) expects them:
+#   -- params: customer_id, region
+_params_pattern = re.compile(r"^\s*--\s*params\s*:\s*(.+?)\s*$", re.MULTILINE)
+
+
+@functools.lru_cache(maxsize=None)
+def declared_params(sql_query: str) -> tuple[str, ...]:
+    """Bind parameter names declared by a `-- params:` comment, if any."""
+
+    match = _params_pattern.search(sql_query)
+    if not match:
+        return ()
+
+    return tuple(name.strip() for name in match.group(1).split(",") if name.strip())
+
+
+def is_jsonl(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in (".jsonl", ".ndjson")
+
+
+def feeder_columns(file_path: str) -> set[str]:
+    """Columns of a feeder file: the CSV header, or the first JSONL row's keys."""
+
+    with open(file_path, newline="") as file:
+        if is_jsonl(file_path):
+            line = next((line for line in file if line.strip()), "{}")
+            return set(json.loads(line))
+
+        return set(next(csv.reader(file), []))
+
+
+class Feeder:
+    """
+    Endless stream of parameter rows from a CSV (header row required) or JSONL
+    file, for one worker process.
+
+    The file is read lazily, one record at a time, and sharded round-robin:
+    worker `shard` of `shards` only keeps records whose line index falls on its
+    shard, so no process ever holds the whole file and no two processes send
+    the same values. When the shard is exhausted the file is read again from
+    the top. CSV values are passed to the driver as strings; use JSONL when a
+    parameter needs a typed value (e.g. an integer for Postgres).
+    """
+
+    def __init__(self, file_path: str, shard: int = 0, shards: int = 1):
+        self.file_path: str = file_path
+        self.shard: int = shard
+        self.shards: int = max(shards, 1)
+        self.records = self.read()
+        # The Databricks backend pulls rows from many threads at once.
+        self.lock = threading.Lock()
+
+    def read(self):
+        jsonl = is_jsonl(self.file_path)
+
+        while True:
+            found = False
+            with open(self.file_path, newline="") as file:
+                # Pick this shard's records before decoding them, so no process
+                # parses the rows that belong to the others.
+                if jsonl:
+                    lines = (line for line in file if line.strip())
+                    shard = itertools.islice(lines, self.shard, None, self.shards)
+                    records = (json.loads(line) for line in shard)
+                else:
+                    rows = csv.reader(file)
+                    header = next(rows, [])
+                    shard = itertools.islice(
+                        (row for row in rows if row), self.shard, None, self.shards
+                    )
+                    records = (dict(zip(header, row)) for row in shard)
+
+                for record in records:
+                    found = True
+                    yield record
+
+            if not found:
+                if self.shards == 1:
+                    raise ValueError(f"{self.file_path}: feeder file has no rows")
+
+                # Fewer rows than processes: share the whole file instead.
+                self.shard, self.shards = 0, 1
+
+    def bind(self, sql_query: str) -> dict | None:
+        """
+        Next row's values for the parameters `sql_query` declares, as
+        {name: value}, or None when it declares none.
+        """
+
+        names = declared_params(sql_query)
+        if not names:
+            return None
+
+        with self.lock:
+            record = next(self.records)
+
+        try:
+            return {name: record[name] for name in names}
+        except KeyError as e:
+            raise ValueError(f"{self.file_path}: feeder has no column {e}") from e
@@ -1,11 +1,26 @@
 import os
-from concurrent.futures import ThreadPoolExecutor
+import random
+import time
+
+from src import live
+from src.search import Probe
 
 # Set once per worker process by `init_worker` via the Pool initializer.
 # A multiprocessing.Barrier cannot be passed as a pickled map() argument under
 # the "spawn" start method; it must be inherited through the initializer.
 _barrier = None
 
+# Shared queue of work chunks in queue dispatch mode, inherited the same way.
+# None means static buckets.
+_work_queue = None
+
+# (plan, results_queue) shared with the parent during a --find_max search.
+_probe_channel = None
+
+# Shared double holding the wall-clock time the last worker of the job was up
+# (spawned, backend imported and constructed), before any pool or warm-up.
+_up = None
+
 
 def resolve_process_count(requested: int | None) -> int:
     """Default to CPU count; always at least 1."""
@@ -16,59 +31,70 @@ def resolve_process_count(requested: int | None) -> int:
     return max(procs, 1)
 
 
-def future_thread_executor(
-    args: list, threads: int | None = None, override_threads: bool = False
-):
+class WeightedSampler:
     """
-    Run a list of callables concurrently on a thread pool and return their
-    results in submission order.
-
-    Each element of `args` is a list whose first item is the callable and whose
-    remaining items are its positional arguments: [fn, arg1, arg2, ...].
-
-    threads / override_threads control the worker count:
-      - default: min(threads, cpu_count * 2), or cpu_count * 2 if threads is None
-      - override_threads: use exactly `threads` workers (e.g. one per task)
-
-    Used by the blocking-driver path (Databricks): the connector has no async
-    API, so concurrency within a process comes from threads here rather than
-    asyncio.gather. Threads spend their time blocked on the network/server, so
-    the GIL is not the bottleneck.
+    O(1) weighted random choice over a fixed set of items (Vose's alias
+    method). Setup is O(n); each `sample` costs two random numbers and a table
+    lookup regardless of how many items or how skewed the weights are, which
+    keeps it off the profile even when every execution draws from it.
     """
 
-    futures_list = []
-    results = []
-    workers: int = (os.cpu_count() or 1) * 2
-
-    if threads:
-        workers = min(threads, workers)
-
-    if override_threads and threads:
-        workers = threads
+    def __init__(self, items: list, weights: list[float]):
+        total = sum(weights)
+        if not items or total <= 0:
+            raise ValueError("Weighted mix needs at least one positive weight")
+
+        count = len(items)
+        scaled = [weight * count / total for weight in weights]
+        self.items: list = list(items)
+        self.probability: list[float] = [1.0] * count
+        self.alias: list[int] = list(range(count))
+
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1
+            (small if scaled[more] < 1 else large).append(more)
+
+    def sample(self):
+        index = int(random.random() * len(self.items))
+        if random.random() < self.probability[index]:
+            return self.items[index]
+
+        return self.items[self.alias[index]]
+
+
+def parse_mix(
+    specs: list[str], queries: list[tuple[str, str]]
+) -> list[tuple[str, str, float]]:
+    """
+    Resolve pgbench-style "file@weight" specs against the loaded queries.
 
-    # If only one worker, run in the calling thread to avoid pool overhead.
-    if workers == 1:
-        for arg in args:
-            results.append(arg[0](*arg[1:]))
+    Files not named in a spec keep the default weight of 1, as in pgbench; give
+    one a weight of 0 to leave it out.
 
-        return results
+    :return: List of (file_name, sql_query, weight), one per query
+    """
 
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        for arg in args:
-            # * unpacks [fn, arg1, ...] into executor.submit(fn, arg1, ...)
-            futures_list.append(executor.submit(*arg))
+    weights: dict[str, float] = {}
+    for spec in specs:
+        file_name, _, weight = spec.rpartition("@")
+        if not file_name:
+            raise ValueError(f"Invalid mix entry '{spec}', expected file@weight")
+        weights[os.path.basename(file_name)] = float(weight)
 
-        # Collect in submission order. A task that raises is logged and recorded
-        # as None rather than aborting the whole batch, so one failed query does
-        # not lose the results of its bucket-mates.
-        for future in futures_list:
-            try:
-                results.append(future.result())
-            except Exception as e:
-                print(f"Thread task error: {e}")
-                results.append(None)
+    known = {file_name for file_name, _ in queries}
+    unknown = sorted(set(weights) - known)
+    if unknown:
+        raise ValueError(f"Mix names unknown query files: {', '.join(unknown)}")
 
-    return results
+    return [
+        (file_name, sql_query, weights.get(file_name, 1.0))
+        for file_name, sql_query in queries
+    ]
 
 
 def build_buckets(
@@ -87,48 +113,84 @@ def build_buckets(
     return [b for b in buckets if b]
 
 
-def merge_durations(
-    target: dict[str, list[float]], source: dict[str, list[float]]
-) -> None:
-    """Merge a worker's {file_name: [durations]} dict into the running total."""
+def build_chunks(
+    items: list[tuple[str, str]], chunk_size: int
+) -> list[list[tuple[str, str]]]:
+    """Cut the work items into the chunks workers pull in queue dispatch mode."""
 
-    for file_name, durations in source.items():
-        target.setdefault(file_name, []).extend(durations)
+    return [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
 
 
-def init_worker(barrier):
+def init_worker(
+    barrier, metrics_queue=None, work_queue=None, probe_channel=None, up=None
+):
     """
     Pool initializer: runs once per worker as it starts up. Stashes the shared
     barrier in a module global so `worker` can reach it without it being passed
     through map() (which would fail to pickle under the spawn start method).
+    The live-metrics and work queues and the probe channel have the same
+    restriction, so the per-process publisher is started here as well.
     """
 
-    global _barrier
+    global _barrier, _work_queue, _probe_channel, _up
     _barrier = barrier
+    _work_queue = work_queue
+    _probe_channel = probe_channel
+    _up = up
+
+    if metrics_queue is not None:
+        live.install(metrics_queue)
 
 
 def worker(payload):
     """
     Top-level worker so it is picklable by multiprocessing.
 
-    payload = (db_factory, db_kwargs, bucket)
+    payload = (db_factory, db_kwargs, bucket), or None for a seat left empty
     The DB connection object is constructed inside the process from plain
     kwargs; nothing holding a live connection is ever pickled across.
 
     Before doing any DB work the worker waits on the shared barrier so every
     process has finished spawning. All workers then leave the barrier together
     and begin connecting/executing at the same moment, removing the staggered
-    interpreter-startup time from the run.
+    interpreter-startup time from the run. The backend calls the barrier wait
+    itself, after any per-process setup (e.g. warming a connection pool), so
+    that setup is not part of the measured run either.
 
-    Returns {file_name: [durations]} for the queries in this bucket.
+    Returns {file_name: QueryStats} for the queries in this bucket.
     """
 
-    db_factory, db_kwargs, bucket = payload
-    db = db_factory(**db_kwargs)
-
-    # Wait until every worker has spawned and reached this point, then release
-    # together. The slowest process to start is what kicks off the whole run.
-    if _barrier is not None:
+    if payload is None:
+        # A seat the job leaves empty (a --sweep cell with fewer processes
+        # than the pool): pass the start barrier with the others and stop.
         _barrier.wait()
+        return {}
 
-    return db.entry(bucket)
+    db_factory, db_kwargs, bucket = payload
+    # Fresh live metrics for this job; the final flush below closes them.
+    live.begin()
+    try:
+        db = db_factory(**db_kwargs)
+
+        # Up and about to open its pool or warm up: what startup alone costs.
+        if _up is not None:
+            with _up.get_lock():
+                _up.value = max(_up.value, time.time())
+
+        # Wait until every worker has spawned and finished its setup, then
+        # release together. The slowest process to get ready starts the run.
+        ready = _barrier.wait if _barrier is not None else None
+
+        # Queue dispatch: the bucket is empty and work is pulled chunk by chunk.
+        work = _work_queue.get if _work_queue is not None else None
+
+        # --find_max: probes are released through the same barrier.
+        probe = (
+            Probe(_barrier, *_probe_channel, db_kwargs["worker_id"])
+            if _probe_channel is not None
+            else None
+        )
+
+        return db.entry(bucket, ready=ready, work=work, probe=probe)
+    finally:
+        live.flush()
@@ -0,0 +1,367 @@
+import asyncio
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+from src.stats import Histogram
+
+# Seconds between the per-process updates and between dashboard lines.
+interval: float = 1.0
+
+# An interval needs at least this many finished runs before its error rate is
+# trusted enough to abort the whole test on.
+abort_min_runs: int = 10
+
+# Client-side resource flags in the end-of-run summary: a worker whose CPU time
+# averages this fraction of one core is CPU-bound (under the GIL, one core is
+# all its Python code gets), and one whose event loop woke up this many
+# seconds late at some point is lagging. Either way the client, not the
+# database, is the bottleneck: add processes or hosts.
+cpu_bound: float = 0.9
+lag_limit: float = 0.1
+
+# Seconds between the event-loop lag watcher's wake-ups.
+lag_tick: float = 0.1
+
+# Set once per process by `install`. None means live metrics are off and the
+# run_* hooks below are no-ops.
+_metrics = None
+
+
+class LiveMetrics:
+    """
+    Per-process interval counters, published to the parent every `interval`.
+
+    The hooks are called from the hot path (every run start/finish), possibly
+    from many threads in the Databricks backend, so they only bump counters
+    under a lock. A daemon thread swaps the counters out once per interval and
+    puts one compact message on the queue: (pid, completed, errors, in_flight,
+    Histogram of the interval's response times, resources, final). `final` is
+    set on the last message of a job, published by `flush` as it ends.
+
+    Only a running job publishes: `begin` starts a fresh set of counters and
+    resource samples, and the final message stops them. A worker sitting
+    between jobs of a --sweep thus sends nothing, and no idle or stale
+    interval leaks into the next job's dashboard.
+
+    `resources` is the process's own client-side sample for the interval:
+    (CPU time as a fraction of the wall time, RSS in bytes, worst event-loop
+    lag in seconds, thread-pool queue depth). Lag comes from `watch_loop` and
+    depth from the callable given to `watch_threads`; both stay 0 otherwise.
+    """
+
+    def __init__(self, metrics_queue):
+        self.queue = metrics_queue
+        self.lock = threading.Lock()
+        self.pid: int = os.getpid()
+        self.completed: int = 0
+        self.errors: int = 0
+        self.in_flight: int = 0
+        self.histogram: Histogram = Histogram()
+        self.lag: float = 0.0
+        self.depth = None
+        self.sampled: float = time.monotonic()
+        self.cpu_time: float = time.process_time()
+        self.active: bool = False
+
+        thread = threading.Thread(target=self.publish_loop, daemon=True)
+        thread.start()
+
+    def begin(self):
+        with self.lock:
+            self.completed = 0
+            self.errors = 0
+            self.in_flight = 0
+            self.histogram = Histogram()
+            self.lag = 0.0
+            self.depth = None
+            self.sampled = time.monotonic()
+            self.cpu_time = time.process_time()
+            self.active = True
+
+    def started(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def finished(self, durations: dict[str, float] | None):
+        with self.lock:
+            self.in_flight -= 1
+            if durations is None or "error" in durations:
+                self.errors += 1
+            else:
+                self.completed += 1
+                self.histogram.record(durations["response"])
+
+    def lagged(self, seconds: float):
+        with self.lock:
+            self.lag = max(self.lag, seconds)
+
+    def sample(self) -> tuple[float, int, float, int]:
+        now, cpu_time = time.monotonic(), time.process_time()
+        cpu = (cpu_time - self.cpu_time) / max(now - self.sampled, 1e-9)
+        self.sampled, self.cpu_time = now, cpu_time
+        depth = self.depth() if self.depth is not None else 0
+
+        return cpu, current_rss(), self.lag, depth
+
+    def publish(self, final: bool = False):
+        with self.lock:
+            if not self.active:
+                return
+            self.active = not final
+            message = (
+                self.pid,
+                self.completed,
+                self.errors,
+                self.in_flight,
+                self.histogram,
+                self.sample(),
+                final,
+            )
+            self.completed = 0
+            self.errors = 0
+            self.histogram = Histogram()
+            self.lag = 0.0
+
+        self.queue.put(message)
+
+    def publish_loop(self):
+        while True:
+            time.sleep(interval)
+            self.publish()
+
+
+def current_rss() -> int:
+    """
+    Resident set size of this process in bytes: the peak where the current one
+    is not available, 0 where neither is.
+    """
+
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return 0
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes everywhere else.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def install(metrics_queue) -> None:
+    """Start publishing this process's live metrics onto `metrics_queue`."""
+
+    global _metrics
+    _metrics = LiveMetrics(metrics_queue)
+
+
+def begin() -> None:
+    """Start publishing a new job's metrics from scratch."""
+
+    if _metrics is not None:
+        _metrics.begin()
+
+
+def flush() -> None:
+    """
+    Publish the current partial interval straight away as the job's final
+    message (end of a bucket).
+    """
+
+    if _metrics is not None:
+        _metrics.publish(final=True)
+
+
+def run_started() -> None:
+    if _metrics is not None:
+        _metrics.started()
+
+
+def run_finished(durations: dict[str, float] | None) -> None:
+    if _metrics is not None:
+        _metrics.finished(durations)
+
+
+async def watch_loop() -> None:
+    """
+    Background task for the async backends: wake every `lag_tick` and record
+    how late the event loop got round to it. A busy loop (too many coroutines,
+    row materialization) delays every query's timestamps by as much.
+    """
+
+    if _metrics is None:
+        return
+
+    while True:
+        due = time.perf_counter() + lag_tick
+        await asyncio.sleep(lag_tick)
+        _metrics.lagged(time.perf_counter() - due)
+
+
+def watch_threads(depth) -> None:
+    """Sample `depth()`, the runs queued for a free thread, every interval."""
+
+    if _metrics is not None:
+        _metrics.depth = depth
+
+
+class ResourceUsage:
+    """One worker's client-side resource samples, summarized over the run."""
+
+    def __init__(self):
+        self.samples: int = 0
+        self.cpu_total: float = 0.0
+        self.cpu_max: float = 0.0
+        self.rss_max: int = 0
+        self.lag_max: float = 0.0
+        self.depth_max: int = 0
+
+    def add(self, sample: tuple[float, int, float, int]):
+        cpu, rss, lag, depth = sample
+        self.samples += 1
+        self.cpu_total += cpu
+        self.cpu_max = max(self.cpu_max, cpu)
+        self.rss_max = max(self.rss_max, rss)
+        self.lag_max = max(self.lag_max, lag)
+        self.depth_max = max(self.depth_max, depth)
+
+    @property
+    def cpu_mean(self) -> float:
+        return self.cpu_total / self.samples if self.samples else 0.0
+
+    @property
+    def flags(self) -> list[str]:
+        flags = []
+        if self.cpu_mean >= cpu_bound:
+            flags.append("CPU-bound")
+        if self.lag_max >= lag_limit:
+            flags.append("lagging")
+
+        return flags
+
+
+class Dashboard:
+    """
+    Parent-side view of the live metrics: folds in worker messages and prints a
+    rolling one-line summary per interval.
+    """
+
+    def __init__(self, abort_error_rate: float = 0, printing: bool = True):
+        self.abort_error_rate: float = abort_error_rate
+        self.printing: bool = printing
+        self.started: float = time.monotonic()
+        self.completed: int = 0
+        self.errors: int = 0
+        self.in_flight: dict[int, int] = {}
+        self.resources: dict[int, ResourceUsage] = {}
+        # Workers whose final message has come in.
+        self.finished: int = 0
+        self.reset_interval()
+
+    def reset_interval(self):
+        self.interval_completed: int = 0
+        self.interval_errors: int = 0
+        self.interval_histogram: Histogram = Histogram()
+        self.interval_cpu: float = 0.0
+        self.interval_started: float = time.monotonic()
+
+    def add(self, message):
+        pid, completed, errors, in_flight, histogram, sample, final = message
+        self.finished += final
+        self.completed += completed
+        self.errors += errors
+        self.in_flight[pid] = in_flight
+        self.interval_completed += completed
+        self.interval_errors += errors
+        self.interval_histogram.merge(histogram)
+        self.resources.setdefault(pid, ResourceUsage()).add(sample)
+        self.interval_cpu = max(self.interval_cpu, sample[0])
+
+    def drain(self, metrics_queue, timeout: float, stop=None):
+        """
+        Fold in every message that arrives within `timeout` seconds. Returns
+        early once `stop()` is true, so the caller notices finished workers
+        without waiting out the rest of the interval.
+        """
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (stop is not None and stop()):
+                break
+            try:
+                self.add(metrics_queue.get(timeout=min(remaining, 0.1)))
+            except queue.Empty:
+                pass
+
+    @property
+    def interval_error_rate(self) -> float:
+        finished = self.interval_completed + self.interval_errors
+        return self.interval_errors / finished if finished else 0.0
+
+    def should_abort(self) -> bool:
+        finished = self.interval_completed + self.interval_errors
+        return (
+            self.abort_error_rate > 0
+            and finished >= abort_min_runs
+            and self.interval_error_rate > self.abort_error_rate
+        )
+
+    def tick(self):
+        """Print the summary line for the interval that just ended."""
+
+        if not self.printing:
+            return
+
+        elapsed = max(time.monotonic() - self.interval_started, 1e-9)
+        histogram = self.interval_histogram
+        now = datetime.now().strftime("%H:%M:%S")
+        print(
+            f"[{now}] {time.monotonic() - self.started:>6.0f}s "
+            f"done {self.completed:>8} "
+            f"({self.interval_completed / elapsed:>7.1f}/s) "
+            f"err {self.errors:>6} ({self.interval_error_rate:>4.0%}) "
+            f"inflight {sum(self.in_flight.values()):>6} "
+            f"p50 {histogram.percentile(50):.3f}s "
+            f"p90 {histogram.percentile(90):.3f}s "
+            f"p99 {histogram.percentile(99):.3f}s "
+            f"cpu {self.interval_cpu:>4.0%}"
+        )
+
+    def report_resources(self):
+        """
+        Print each worker's client-side CPU, memory and lag over the run, and
+        flag the ones that were the bottleneck rather than the database.
+        """
+
+        if not self.printing or not self.resources:
+            return
+
+        print(
+            f"\n{'Worker':>8}{'CPU avg':>9}{'CPU max':>9}{'RSS max':>10}"
+            f"{'Lag max':>9}{'Queued':>8}"
+        )
+        flagged = 0
+        for pid in sorted(self.resources):
+            usage = self.resources[pid]
+            flags = usage.flags
+            flagged += bool(flags)
+            line = (
+                f"{pid:>8}{usage.cpu_mean:>9.0%}{usage.cpu_max:>9.0%}"
+                f"{usage.rss_max / 1e6:>8.0f}MB{usage.lag_max:>8.3f}s"
+                f"{usage.depth_max:>8}  {', '.join(flags)}"
+            )
+            print(line.rstrip())
+        if flagged:
+            print(
+                f"{flagged} worker(s) limited by the client, not the database: "
+                "add --processes or hosts (--agents) before reading the results"
+            )
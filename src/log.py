@@ -0,0 +1,82 @@
+import sys
+import threading
+
+# Verbosity levels, least output first. "quiet" prints nothing from the
+# workers, "summary" one-off lines (pool warmed, warm-up) and errors, and
+# "verbose" adds a line per run (connected, rows fetched, fetch heartbeats).
+levels: tuple[str, ...] = ("quiet", "summary", "verbose")
+
+# Seconds between flushes of the buffered lines to stdout.
+flush_interval: float = 1.0
+
+# Lines buffered before a flush happens straight away, bounding memory when a
+# run prints a lot (e.g. --print without --print_rows).
+max_buffered: int = 10_000
+
+
+class Logger:
+    """
+    Per-process buffered console output for the backends.
+
+    Runs only append their lines to a buffer under a lock, so no run blocks on
+    a terminal or pipe; a daemon thread writes the buffer out every
+    `flush_interval` in one call, which also keeps lines from different
+    coroutines and threads whole. Printed result rows are capped at
+    `row_limit` per query file (0 prints every row).
+    """
+
+    def __init__(self, level: str = "summary", row_limit: int = 0):
+        self.level: int = levels.index(level)
+        self.row_limit: int = row_limit
+        self.rows_printed: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.buffer: list[str] = []
+        self.closed = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def write(self, text: str):
+        with self.lock:
+            self.buffer.append(text)
+            if self.thread is None:
+                # Started lazily, so a quiet run never has one.
+                self.thread = threading.Thread(target=self.flush_loop, daemon=True)
+                self.thread.start()
+            full = len(self.buffer) >= max_buffered
+        if full:
+            self.flush()
+
+    def summary(self, text: str):
+        if self.level >= 1:
+            self.write(text)
+
+    def verbose(self, text: str):
+        if self.level >= 2:
+            self.write(text)
+
+    def rows(self, file_name: str, rows):
+        """Print fetched rows, up to `row_limit` per file for this process."""
+
+        if self.row_limit > 0:
+            with self.lock:
+                printed = self.rows_printed.get(file_name, 0)
+                rows = rows[: max(self.row_limit - printed, 0)]
+                self.rows_printed[file_name] = printed + len(rows)
+        for row in rows:
+            self.write(str(row))
+
+    def flush(self):
+        with self.lock:
+            lines, self.buffer = self.buffer, []
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+
+    def flush_loop(self):
+        while not self.closed.wait(flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stop the flush thread and write out whatever is left."""
+
+        self.closed.set()
+        self.flush()
@@ -1,19 +1,54 @@
 import argparse
 import getpass
+import importlib
+import itertools
+import math
 import multiprocessing
 import os
+import queue
+import sys
+import threading
 import time
+from multiprocessing.pool import ThreadPool
 
-from src.databricks_db import DatabricksDB
+from src import distributed, events, live, log
+from src.compare import ResultSet
+from src.feeder import declared_params, feeder_columns
 from src.functions import (
+    WeightedSampler,
     build_buckets,
+    build_chunks,
     init_worker,
-    merge_durations,
+    parse_mix,
     resolve_process_count,
     worker,
 )
-from src.oracle_db import OracleDB
-from src.postgres_db import PostgresDB
+from src.scheduler import load_schedule, split_stages
+from src.search import Search
+from src.stats import (
+    QueryStats,
+    merge_results,
+    merge_stage_results,
+    overall_stats,
+    percentiles,
+    phases,
+)
+
+# Backend class for each --database, as (module, class). Only the selected one
+# is imported: in the parent here, and in each worker when its payload is
+# unpickled, so no process loads drivers (e.g. the Databricks/pyarrow stack)
+# it does not use.
+backends: dict[str, tuple[str, str]] = {
+    "postgres": ("src.postgres_db", "PostgresDB"),
+    "oracle": ("src.oracle_db", "OracleDB"),
+    "databricks": ("src.databricks_db", "DatabricksDB"),
+    "mock": ("src.mock_db", "MockDB"),
+}
+
+
+def load_backend(name: str):
+    module, cls = backends[name]
+    return getattr(importlib.import_module(module), cls)
 
 
 def read_sql_file(file_path: str) -> tuple[str, str]:
@@ -30,6 +65,39 @@ def read_sql_file(file_path: str) -> tuple[str, str]:
     return os.path.basename(file_path), sql_query
 
 
+def parse_warmup(text: str) -> tuple[int, float]:
+    """
+    Parse --warmup: "30s" is a duration, a bare number a run count.
+
+    :return: (warmup_iterations, warmup_duration)
+    """
+
+    try:
+        if text.endswith("s"):
+            return 0, float(text[:-1])
+        return int(text), 0.0
+    except ValueError:
+        raise ValueError(f"--warmup {text}: expected a run count or seconds, e.g. 30s")
+
+
+def longest_first(
+    items: list[tuple[str, str]], events_path: str
+) -> list[tuple[str, str]]:
+    """
+    Order work items by their file's average service time in a previous run's
+    --output file, longest first. Files that run did not cover go first, as
+    nothing is known about them.
+    """
+
+    previous = ResultSet(events_path).results
+
+    def expected(item: tuple[str, str]) -> float:
+        stats = previous.get(item[0])
+        return stats.phases["total"].mean if stats else math.inf
+
+    return sorted(items, key=expected, reverse=True)
+
+
 def read_sql_folder(folder_path: str) -> list[tuple[str, str]]:
     """
     Read the SQL queries from a folder containing multiple SQL files.
@@ -67,33 +135,278 @@ def arguments() -> argparse.Namespace:
     parser.add_argument(
         "--instances",
         type=int,
-        required=True,
-        help="Number of parallel instances (copies) to run per query",
+        nargs="+",
+        help="Number of parallel instances (copies) to run per query "
+        "(required unless --rate or --schedule is set). Several values, here "
+        "or for --processes or --fetch_size, run a sweep of every combination",
     )
     parser.add_argument(
         "--processes",
         type=int,
-        default=0,
+        nargs="+",
+        default=[0],
         help="Number of worker processes to spread the load across "
         "(default 0 = CPU count)",
     )
     parser.add_argument(
         "--fetch_size",
         type=int,
-        default=0,
+        nargs="+",
+        default=[0],
         help="Number of rows to fetch per batch (default 0, no fetch)",
     )
+    parser.add_argument(
+        "--cooldown",
+        type=float,
+        default=0,
+        help="Sweep: seconds to pause between two combinations (default 0)",
+    )
+    parser.add_argument(
+        "--arrow",
+        action="store_true",
+        help="Drain results as Arrow batches (oracle/databricks) or a binary COPY "
+        "stream (postgres) and only count them, without building Python rows",
+    )
+    parser.add_argument(
+        "--dispatch",
+        choices=["static", "queue"],
+        default="static",
+        help="How --instances runs reach the processes: static round-robin "
+        "buckets fired all at once (default), or a shared queue each process "
+        "pulls from as it frees up",
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=1,
+        help="Queue dispatch: queries taken from the shared queue per pull "
+        "(default 1); each process keeps its share of --instances in flight",
+    )
+    parser.add_argument(
+        "--longest_first",
+        metavar="EVENTS",
+        help="Queue dispatch: order the work by each file's average service "
+        "time in this --output file of a previous run, longest first",
+    )
+    parser.add_argument(
+        "--max_inflight",
+        type=int,
+        default=0,
+        help="Most queries each process keeps in flight at once; the rest queue "
+        "for a free slot, and that wait shows as the wait phase (default 0, "
+        "no limit)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=0,
+        help="Per-query time limit in seconds, enforced by the server where the "
+        "backend supports it (Postgres statement_timeout, Oracle call timeout, "
+        "Databricks STATEMENT_TIMEOUT) with a client-side backstop. Slower runs "
+        "fail as 'timeout' errors (default 0, no limit)",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0,
+        help="Open-loop mode: target queries per second across all processes "
+        "(default 0, one-shot burst of --instances)",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=0,
+        help="Seconds to keep issuing queries in --rate mode; without --rate, "
+        "each instance loops its query for this long",
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=0,
+        help="Closed-loop mode: each instance runs its query this many times "
+        "back to back (default 0, once; combine with --duration to cap time)",
+    )
+    parser.add_argument(
+        "--warmup",
+        help="Warm-up before measuring: a run count per instance (e.g. 20) or a "
+        "duration (e.g. 30s). Those runs execute normally but are excluded from "
+        "the report; measurement starts at the same moment in every worker",
+    )
+    parser.add_argument(
+        "--find_max",
+        choices=["concurrency", "rate"],
+        help="Search for the highest concurrency (virtual users) or arrival rate "
+        "that still meets --slo: the level doubles until a probe fails, then "
+        "the bracket is bisected. Prints the throughput-vs-latency curve",
+    )
+    parser.add_argument(
+        "--slo",
+        type=float,
+        help="--find_max: p99 response time limit in seconds a probe must meet",
+    )
+    parser.add_argument(
+        "--slo_error_rate",
+        type=float,
+        default=0.01,
+        help="--find_max: largest fraction of failed runs a probe may have "
+        "(default 0.01)",
+    )
+    parser.add_argument(
+        "--probe_duration",
+        type=float,
+        default=10,
+        help="--find_max: seconds each probe runs (default 10)",
+    )
+    parser.add_argument(
+        "--probe_start",
+        type=float,
+        help="--find_max: level of the first probe (default one virtual user, "
+        "or one query per second, per process)",
+    )
+    parser.add_argument(
+        "--think_time",
+        type=float,
+        default=0,
+        help="Seconds a virtual user pauses between queries in closed-loop and "
+        "--schedule modes (default 0)",
+    )
+    parser.add_argument(
+        "--think_distribution",
+        default="fixed",
+        choices=["fixed", "exponential"],
+        help="Fixed think time, or exponential with mean --think_time "
+        "(default fixed)",
+    )
+    parser.add_argument(
+        "--mix",
+        nargs="+",
+        metavar="FILE@WEIGHT",
+        help="Weighted workload mix, e.g. lookup.sql@80 report.sql@15 agg.sql@5; "
+        "every execution slot draws its query by weight (unlisted files weigh 1)",
+    )
+    parser.add_argument(
+        "--feeder",
+        help="CSV/JSONL file of bind parameter values for queries that declare "
+        "'-- params: name, ...'; rows are sharded across worker processes",
+    )
+    parser.add_argument(
+        "--unprepared",
+        action="store_true",
+        help="Disable per-session statement reuse so every execution is parsed "
+        "and planned again (postgres/oracle, default False)",
+    )
+    parser.add_argument(
+        "--schedule",
+        help="Path to a JSON/TOML/YAML concurrency schedule (stages of virtual "
+        "users and durations); replaces --instances",
+    )
+    parser.add_argument(
+        "--pool",
+        action="store_true",
+        help="Reuse pooled sessions per worker process instead of connecting "
+        "for every query (default False)",
+    )
+    parser.add_argument(
+        "--pool_min",
+        type=int,
+        default=1,
+        help="Connections opened and warmed per process before the run starts "
+        "in --pool mode (default 1)",
+    )
+    parser.add_argument(
+        "--pool_max",
+        type=int,
+        default=10,
+        help="Maximum connections per process in --pool mode (default 10)",
+    )
+    parser.add_argument(
+        "--abort_error_rate",
+        type=float,
+        default=0,
+        help="Abort the run once the error rate over one live dashboard interval "
+        "exceeds this fraction, e.g. 0.5 (default 0, never abort)",
+    )
+    parser.add_argument(
+        "--output",
+        help="Stream one raw event per run (file, worker, phase timestamps, "
+        "rows, bytes, error) to this .parquet, .csv or .jsonl file",
+    )
+    parser.add_argument(
+        "--agents",
+        nargs="+",
+        metavar="HOST:PORT",
+        help="Run the workers on these remote agents (main.py agent) instead of "
+        "locally; each agent runs --processes workers",
+    )
+    parser.add_argument(
+        "--agent_key",
+        help=f"Shared secret for --agents, also read from "
+        f"${distributed.key_variable}",
+    )
+    parser.add_argument(
+        "--start_method",
+        default="spawn",
+        choices=["spawn", "forkserver"],
+        help="How worker processes start: spawn (default), or forkserver, which "
+        "imports the selected backend once and forks every worker from it "
+        "(not on Windows)",
+    )
     parser.add_argument(
         "--database",
         default="postgres",
-        choices=["postgres", "oracle", "databricks"],
+        choices=list(backends),
         help="Database type (default postgres)",
     )
+    parser.add_argument(
+        "--mock_latency",
+        type=float,
+        default=0.01,
+        help="Mock backend: mean simulated execute latency in seconds "
+        "(default 0.01)",
+    )
+    parser.add_argument(
+        "--mock_distribution",
+        default="fixed",
+        choices=["fixed", "uniform", "exponential", "lognormal"],
+        help="Mock backend: distribution of the simulated latency (default fixed)",
+    )
+    parser.add_argument(
+        "--mock_connect_latency",
+        type=float,
+        default=0,
+        help="Mock backend: simulated login time per connection (default 0)",
+    )
+    parser.add_argument(
+        "--mock_rows",
+        type=int,
+        default=0,
+        help="Mock backend: rows returned by every query (default 0)",
+    )
+    parser.add_argument(
+        "--mock_row_size",
+        type=int,
+        default=100,
+        help="Mock backend: bytes per simulated row (default 100)",
+    )
     parser.add_argument(
         "--print",
         action="store_true",
         help="Print the results of the SQL query (default False)",
     )
+    parser.add_argument(
+        "--print_rows",
+        type=int,
+        default=0,
+        help="With --print, print at most this many rows per query file and "
+        "process (default 0, every row)",
+    )
+    parser.add_argument(
+        "--log_level",
+        default="summary",
+        choices=log.levels,
+        help="Worker console output: quiet (none), summary (pool, warm-up and "
+        "errors) or verbose (also a line per run) (default summary)",
+    )
     parser.add_argument(
         "--prefix",
         type=str,
@@ -104,67 +417,589 @@ def arguments() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def report(results: dict[str, list[float]]) -> None:
+def report_phases(stats: QueryStats, indent: str = "  ") -> None:
+    """Print average, median, p99 and maximum for each phase, in milliseconds."""
+
+    print(f"{indent}{'Phase':<10}{'Average':>12}{'p50':>12}{'p99':>12}{'Maximum':>12}")
+    for phase in phases:
+        histogram = stats.phases[phase]
+        print(
+            f"{indent}{phase:<10}"
+            f"{histogram.mean * 1000:>10.2f}ms"
+            f"{histogram.percentile(50) * 1000:>10.2f}ms"
+            f"{histogram.percentile(99) * 1000:>10.2f}ms"
+            f"{histogram.maximum * 1000:>10.2f}ms"
+        )
+
+
+def report_stats(stats: QueryStats, label: str = "", indent: str = "  ") -> None:
+    """
+    Print run count, totals, throughput and latency percentiles (in
+    milliseconds) for one QueryStats, with latency as service time (the query
+    itself) next to response time (measured from when the scheduler meant to
+    start it, so queueing behind a slow query counts).
+    """
+
+    service = stats.phases["total"]
+    response = stats.phases["response"]
+    width = 10 + len(label)
+    print(f"{indent}{label + 'Runs':<{width}}: {service.count}")
+    if stats.failed:
+        categories = ", ".join(
+            f"{category} {count}" for category, count in sorted(stats.errors.items())
+        )
+        print(
+            f"{indent}{label + 'Errors':<{width}}: {stats.failed} "
+            f"({stats.error_rate:.1%}: {categories})"
+        )
+    if not service.count:
+        return
+    print(f"{indent}{label + 'Aggregated':<{width}}: {service.total:.2f}s")
+    throughput = [
+        ("Queries/s", f"{stats.per_second(stats.runs):.1f}"),
+        ("Rows/s", f"{stats.per_second(stats.rows):.0f}"),
+        ("MB/s", f"{stats.per_second(stats.bytes) / 1e6:.2f}"),
+    ]
+    for name, value in throughput:
+        print(f"{indent}{label + name:<{width}}: {value}")
+    # Milliseconds to two decimals: fine enough for the histograms' 1%
+    # buckets on sub-millisecond queries.
+    print(f"{indent}{'':<{width}}  {'Service':>10}{'Response':>12}")
+    rows = [("Average", service.mean, response.mean)]
+    rows.append(("Minimum", service.minimum, response.minimum))
+    for q in percentiles:
+        rows.append((f"p{q:g}", service.percentile(q), response.percentile(q)))
+    rows.append(("Maximum", service.maximum, response.maximum))
+    for name, service_value, response_value in rows:
+        print(
+            f"{indent}{label + name:<{width}}: "
+            f"{service_value * 1000:>8.2f}ms{response_value * 1000:>10.2f}ms"
+        )
+    report_phases(stats, indent)
+
+
+def report(results: dict[str, QueryStats]) -> None:
     """Print per-file stats plus an overall roll-up."""
 
     if not results:
         print("No instances completed successfully")
         return
 
-    all_durations: list[float] = []
     for file_name in sorted(results):
-        durations = results[file_name]
-        all_durations.extend(durations)
-
         print(f"\n{file_name}")
-        print(f"  Runs      : {len(durations)}")
-        print(f"  Aggregated: {sum(durations):.2f}s")
-        print(f"  Average   : {sum(durations) / len(durations):.2f}s")
-        print(f"  Minimum   : {min(durations):.2f}s")
-        print(f"  Maximum   : {max(durations):.2f}s")
+        report_stats(results[file_name])
 
+    overall = overall_stats(results)
     print(f"\n{'=' * 40}")
-    print(f"Overall runs      : {len(all_durations)}")
-    print(f"Overall aggregated: {sum(all_durations):.2f}s")
-    print(f"Overall average   : {sum(all_durations) / len(all_durations):.2f}s")
-    print(f"Overall minimum   : {min(all_durations):.2f}s")
-    print(f"Overall maximum   : {max(all_durations):.2f}s")
+    report_stats(overall, label="Overall ", indent="")
     print(f"{'=' * 40}")
 
+    if not overall.runs:
+        print("No instances completed successfully")
+
 
-def execute_queries_concurrently(
+def report_stages(
+    stages: list[tuple[int, float]], results: list[dict[str, QueryStats]]
+) -> None:
+    """Print throughput and response time for each stage of a schedule."""
+
+    print(
+        f"\n{'Stage':>5}{'Users':>7}{'Seconds':>9}{'Runs':>9}{'QPS':>9}"
+        f"{'p50':>9}{'p90':>9}{'p99':>9}{'Maximum':>9}"
+    )
+    for stage, ((concurrency, duration), stage_results) in enumerate(
+        zip(stages, results), start=1
+    ):
+        histogram = overall_stats(stage_results).phases["response"]
+
+        print(
+            f"{stage:>5}{concurrency:>7}{duration:>9.0f}{histogram.count:>9}"
+            f"{histogram.count / duration:>9.1f}"
+            f"{histogram.percentile(50):>8.3f}s"
+            f"{histogram.percentile(90):>8.3f}s"
+            f"{histogram.percentile(99):>8.3f}s"
+            f"{histogram.maximum:>8.3f}s"
+        )
+
+
+def stream_results(
+    pool, payloads: list, metrics_queue, dashboard: live.Dashboard, results, merge
+) -> bool:
+    """
+    Submit every payload to `pool` and `merge` each worker's result into
+    `results` as it finishes, printing one dashboard line per live-metrics
+    interval meanwhile.
+
+    Returns True if the dashboard tripped its abort threshold, in which case the
+    loop stops straight away and `results` only holds what completed so far.
+    Otherwise the last line waits for every worker's final live message, so it
+    counts every run (or gives up on a missing one after one interval).
+    """
+
+    pending = [pool.apply_async(worker, (payload,)) for payload in payloads]
+    workers = sum(payload is not None for payload in payloads)
+
+    def done() -> bool:
+        return (
+            all(result.ready() for result in pending) and dashboard.finished >= workers
+        )
+
+    while pending:
+        dashboard.drain(metrics_queue, live.interval, stop=done)
+        dashboard.tick()
+
+        if dashboard.should_abort():
+            print(
+                f"Aborting: error rate {dashboard.interval_error_rate:.0%} over "
+                f"the last interval exceeds {dashboard.abort_error_rate:.0%}"
+            )
+            return True
+        dashboard.reset_interval()
+
+        for result in [result for result in pending if result.ready()]:
+            pending.remove(result)
+            merge(results, result.get())
+
+    return False
+
+
+def instance_buckets(
+    queries: list[tuple[str, str]],
+    mix: list[tuple[str, str, float]] | None,
+    instances: int,
+    processes: int,
+) -> list[list[tuple[str, str]]]:
+    """Buckets of an --instances run: `instances` copies of every query."""
+
+    if not mix:
+        return build_buckets(queries, instances, processes)
+
+    # Same number of slots as without a mix, but each one is filled by a
+    # weighted draw instead of an equal share per query.
+    sampler = WeightedSampler(
+        [(file_name, sql_query) for file_name, sql_query, _ in mix],
+        [weight for _, _, weight in mix],
+    )
+    slots = [sampler.sample() for _ in range(instances * len(queries))]
+    return build_buckets(slots, 1, processes)
+
+
+def build_payloads(
     db_factory,
     db_kwargs: dict,
     buckets: list[list[tuple[str, str]]],
+    stages: list[tuple[int, float]] | None = None,
+) -> list:
+    """One (db_factory, worker_kwargs, bucket) payload per worker."""
+
+    payloads = []
+    for index, bucket in enumerate(buckets):
+        worker_kwargs = dict(db_kwargs)
+        if stages:
+            # Each process gets its own share of every stage's concurrency.
+            worker_kwargs["stages"] = split_stages(stages, index, len(buckets))
+        if db_kwargs.get("feeder"):
+            # ...and its own shard of the parameter rows.
+            worker_kwargs["feeder_shard"] = (index, len(buckets))
+        if db_kwargs.get("output"):
+            # ...and its own part file of raw events, combined at the end.
+            worker_kwargs["output"] = events.part_path(db_kwargs["output"], index)
+        worker_kwargs["worker_id"] = index
+        payloads.append((db_factory, worker_kwargs, bucket))
+
+    return payloads
+
+
+def hold_barrier(barrier, workers: int, start=None) -> None:
+    """
+    Keep the workers waiting at `barrier` until every one of them is there and
+    `start()` (if any) has returned, then join it to release them all. If
+    `start` fails, the barrier is broken so the workers do not wait forever.
+    """
+
+    if start is not None:
+        try:
+            while barrier.n_waiting < workers:
+                time.sleep(0.01)
+            start()
+        except BaseException:
+            barrier.abort()
+            raise
+
+    barrier.wait()
+
+
+class WorkerPool:
+    """
+    The worker processes (a thread, for a single worker) and what they inherit
+    through the pool initializer: the start barrier, the live-metrics queue,
+    the time the last worker was up, and the work queue and probe channel when
+    queue dispatch or --find_max need them.
+
+    The barrier has one extra seat for the parent, so it sees the moment the
+    workers are released (and decides it, when something else sets the
+    start). A pool can run several jobs in turn, each with up to `workers`
+    payloads.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        start_method: str = "spawn",
+        preload: str | None = None,
+        work: bool = False,
+        probes: bool = False,
+    ):
+        self.workers: int = workers
+        parties = workers + 1
+        if workers == 1:
+            # Single worker: no extra process. It runs on a thread here,
+            # leaving the main thread free to drive the dashboard.
+            self.metrics_queue = queue.Queue()
+            self.work_queue = queue.Queue() if work else None
+            self.probe_channel = (
+                ([0.0] * (1 + workers), queue.Queue()) if probes else None
+            )
+            self.barrier = threading.Barrier(parties)
+            self.up = multiprocessing.Value("d", 0.0)
+            init_worker(
+                self.barrier,
+                self.metrics_queue,
+                self.work_queue,
+                self.probe_channel,
+                self.up,
+            )
+            self.pool = ThreadPool(1)
+            return
+
+        ctx = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            # Imported once in the server; workers fork with them loaded.
+            ctx.set_forkserver_preload(["src.functions", *filter(None, [preload])])
+        self.metrics_queue = ctx.Queue()
+        self.work_queue = ctx.Queue() if work else None
+        self.probe_channel = (
+            (ctx.Array("d", 1 + workers, lock=False), ctx.Queue()) if probes else None
+        )
+        # Each worker waits here once it has spawned and built its DB object,
+        # so all processes leave together and begin connecting/executing at
+        # the same moment -- removing the staggered interpreter-startup time
+        # from the measured run.
+        self.barrier = ctx.Barrier(parties)
+        # When the last worker was up, before its pool and warm-up, so the
+        # startup report can tell the two apart.
+        self.up = ctx.Value("d", 0.0)
+        self.pool = ctx.Pool(
+            processes=workers,
+            initializer=init_worker,
+            initargs=(
+                self.barrier,
+                self.metrics_queue,
+                self.work_queue,
+                self.probe_channel,
+                self.up,
+            ),
+        )
+
+    def close(self):
+        self.pool.terminate()
+
+
+def run_payloads(
+    payloads: list,
+    abort_error_rate: float = 0,
+    stages: list[tuple[int, float]] | None = None,
+    dashboard: bool = True,
+    output: str | None = None,
+    start=None,
+    chunks: list[list[tuple[str, str]]] | None = None,
+    search: Search | None = None,
+    start_method: str = "spawn",
+    pool: WorkerPool | None = None,
 ):
-    payloads = [(db_factory, db_kwargs, bucket) for bucket in buckets]
+    """
+    Run one payload per worker and collect their results, without reporting.
+
+    With `chunks` (queue dispatch), workers pull those chunks from a shared
+    queue as they free up instead of running their bucket; the bucket is only
+    used for the warm-up.
+
+    `start`, if given, is called once every worker is ready and waiting at the
+    barrier; they are released when it returns (agents use it to start on the
+    coordinator's signal).
 
-    # Accumulate {file_name: [durations]} across all workers.
-    results: dict[str, list[float]] = {}
+    With `search` (--find_max), the parent drives the workers from one probe to
+    the next through the barrier and a shared plan; their results come back
+    through the search, not in the returned results.
 
-    if len(buckets) == 1:
-        # Single worker: nothing to synchronize, run inline without a barrier.
-        db = db_factory(**db_kwargs)
-        merge_durations(results, db.entry(buckets[0]))
+    Workers are started with `start_method`: "spawn", or "forkserver", which
+    imports the backend once in a server process that every worker is forked
+    from. The time from launch until the last worker is up, and until the
+    start barrier releases after its pool and warm-up, is printed.
+    Given a `pool` (a --sweep), the job runs on its workers instead and leaves
+    the pool up afterwards, unless the job aborted.
+
+    :return: (results, aborted); results is {file_name: QueryStats}, or one
+        such dict per stage when running a schedule
+    """
+
+    if stages:
+        # One {file_name: QueryStats} per stage, accumulated across workers.
+        results = [{} for _ in stages]
+        merge = merge_stage_results
     else:
-        ctx = multiprocessing.get_context("spawn")
-        # Barrier sized to the worker count. Each worker waits here once it has
-        # spawned and built its DB object, so all processes leave together and
-        # begin connecting/executing at the same moment -- removing the
-        # staggered interpreter-startup time from the measured run.
-        barrier = ctx.Barrier(len(buckets))
-        with ctx.Pool(
-            processes=len(buckets),
-            initializer=init_worker,
-            initargs=(barrier,),
-        ) as pool:
-            for result in pool.map(worker, payloads):
-                merge_durations(results, result)
+        # Accumulate {file_name: QueryStats} across all workers.
+        results = {}
+        merge = merge_results
+
+    # Wall-clock, to compare with the workers' own `up` times.
+    launched = time.time()
+    owned = pool is None
+    if owned:
+        pool = WorkerPool(
+            len(payloads),
+            start_method,
+            payloads[0][0].__module__,
+            work=bool(chunks),
+            probes=bool(search),
+        )
+    # Seats of a shared pool this job does not need sit it out.
+    seats = payloads + [None] * (pool.workers - len(payloads))
+    pool.up.value = 0.0
+
+    if chunks:
+        # Every chunk up front, then one end marker per worker.
+        for chunk in chunks:
+            pool.work_queue.put(chunk)
+        for _ in payloads:
+            pool.work_queue.put(None)
+
+    def seat():
+        hold_barrier(pool.barrier, pool.workers, start)
+        if dashboard:
+            # Up is spawn and import alone; the gap until the release is pool
+            # opening and warm-up (and, on an agent, the coordinator's start).
+            print(
+                f"Startup: {len(payloads)} workers up "
+                f"{max(pool.up.value - launched, 0):.2f}s after launch, released "
+                f"after {time.time() - launched:.2f}s"
+            )
+        if search:
+            search.control(pool.barrier, pool.probe_channel)
+
+    threading.Thread(target=seat, daemon=True).start()
+
+    monitor = live.Dashboard(abort_error_rate, printing=dashboard)
+    finished = False
+    try:
+        aborted = stream_results(
+            pool.pool, seats, pool.metrics_queue, monitor, results, merge
+        )
+        finished = not aborted
+    finally:
+        # Workers still running (after an abort or an error) can only be
+        # stopped by terminating the pool; otherwise a shared pool stays up
+        # for its next job.
+        if owned or not finished:
+            pool.close()
+    monitor.report_resources()
+
+    if output:
+        events.combine(output, [kwargs["output"] for _, kwargs, _ in payloads])
+
+    return results, aborted
+
+
+def run_workers(
+    db_factory,
+    db_kwargs: dict,
+    buckets: list[list[tuple[str, str]]],
+    abort_error_rate: float = 0,
+    stages: list[tuple[int, float]] | None = None,
+    dashboard: bool = True,
+    chunks: list[list[tuple[str, str]]] | None = None,
+    search: Search | None = None,
+    start_method: str = "spawn",
+):
+    """
+    Run one bucket per worker on this host and collect their results, without
+    reporting. Returns (results, aborted) as `run_payloads` does.
+    """
+
+    return run_payloads(
+        build_payloads(db_factory, db_kwargs, buckets, stages),
+        abort_error_rate,
+        stages,
+        dashboard,
+        db_kwargs.get("output"),
+        chunks=chunks,
+        search=search,
+        start_method=start_method,
+    )
+
+
+def execute_queries_concurrently(
+    db_factory,
+    db_kwargs: dict,
+    buckets: list[list[tuple[str, str]]],
+    abort_error_rate: float = 0,
+    stages: list[tuple[int, float]] | None = None,
+    agents: list[str] | None = None,
+    agent_key: bytes | None = None,
+    chunks: list[list[tuple[str, str]]] | None = None,
+    search: Search | None = None,
+    start_method: str = "spawn",
+):
+    if agents:
+        results, aborted = distributed.coordinate(
+            agents,
+            agent_key,
+            build_payloads(db_factory, db_kwargs, buckets, stages),
+            abort_error_rate,
+            stages,
+            db_kwargs.get("output"),
+            start_method,
+        )
+    else:
+        results, aborted = run_workers(
+            db_factory,
+            db_kwargs,
+            buckets,
+            abort_error_rate,
+            stages,
+            chunks=chunks,
+            search=search,
+            start_method=start_method,
+        )
+
+    if search:
+        search.report()
+        if aborted:
+            print("Search aborted early; the curve above is incomplete")
+        return
+
+    if stages:
+        report_stages(stages, results)
+        # The per-file breakdown below covers every stage combined.
+        combined: dict[str, QueryStats] = {}
+        for stage_results in results:
+            merge_results(combined, stage_results)
+        results = combined
 
     report(results)
+    if aborted:
+        print("Run aborted early; the stats above only cover finished workers")
+
+
+def report_sweep(
+    cells: list[tuple[tuple[int, int, int], QueryStats, bool]],
+) -> None:
+    """Print one row of throughput and response time per sweep combination."""
+
+    print(
+        f"\n{'Instances':>9}{'Processes':>10}{'Fetch':>7}{'Runs':>8}{'QPS':>9}"
+        f"{'Rows/s':>10}{'p50':>9}{'p90':>9}{'p99':>9}{'Errors':>8}"
+    )
+    for (instances, processes, fetch_size), stats, aborted in cells:
+        response = stats.phases["response"]
+        print(
+            f"{instances:>9}{processes:>10}{fetch_size:>7}{stats.runs:>8}"
+            f"{stats.per_second(stats.runs):>9.1f}"
+            f"{stats.per_second(stats.rows):>10.0f}"
+            f"{response.percentile(50):>8.3f}s{response.percentile(90):>8.3f}s"
+            f"{response.percentile(99):>8.3f}s{stats.failed:>8}"
+            f"{'  aborted' if aborted else ''}"
+        )
+
+    completed = [cell for cell in cells if cell[1].runs]
+    if not completed:
+        return
+
+    (instances, processes, fetch_size), stats, _ = max(
+        completed, key=lambda cell: cell[1].per_second(cell[1].runs)
+    )
+    print(
+        f"\nHighest throughput: --instances {instances} --processes {processes} "
+        f"--fetch_size {fetch_size} at {stats.per_second(stats.runs):.1f} QPS"
+    )
+
+
+def run_sweep(
+    db_factory,
+    db_kwargs: dict,
+    queries: list[tuple[str, str]],
+    mix: list[tuple[str, str, float]] | None,
+    cells: list[tuple[int, int, int]],
+    cooldown: float = 0,
+    abort_error_rate: float = 0,
+    start_method: str = "spawn",
+) -> None:
+    """
+    Run every (instances, processes, fetch_size) combination in turn on one
+    pool of worker processes, sized for the largest, so processes are spawned
+    and drivers imported only once. Each run prints its dashboard; a table
+    comparing them all comes at the end. With --output, every combination
+    gets its own event file, numbered in run order.
+    """
+
+    workers = max(resolve_process_count(processes) for _, processes, _ in cells)
+    summary = []
+    pool = None
+    try:
+        for index, (instances, processes, fetch_size) in enumerate(cells):
+            if index and cooldown > 0:
+                time.sleep(cooldown)
+
+            processes = resolve_process_count(processes)
+            print(
+                f"\nSweep {index + 1}/{len(cells)}: --instances {instances} "
+                f"--processes {processes} --fetch_size {fetch_size}"
+            )
+            if pool is None:
+                pool = WorkerPool(workers, start_method, db_factory.__module__)
+
+            cell_kwargs = dict(db_kwargs, fetch_size=fetch_size)
+            if db_kwargs.get("output"):
+                root, extension = os.path.splitext(db_kwargs["output"])
+                cell_kwargs["output"] = f"{root}.{index + 1}{extension}"
+            buckets = instance_buckets(queries, mix, instances, processes)
+            results, aborted = run_payloads(
+                build_payloads(db_factory, cell_kwargs, buckets),
+                abort_error_rate,
+                output=cell_kwargs.get("output"),
+                pool=pool,
+            )
+            if aborted:
+                # The pool was terminated to stop the run; start a fresh one.
+                pool = None
+
+            summary.append(
+                ((instances, processes, fetch_size), overall_stats(results), aborted)
+            )
+
+    finally:
+        if pool is not None:
+            pool.close()
+
+    report_sweep(summary)
 
 
 def main():
+    if sys.argv[1:2] == ["bench"]:
+        from src import bench
+
+        bench.main(sys.argv[2:])
+        return
+
+    if sys.argv[1:2] == ["agent"]:
+        distributed.main(sys.argv[2:])
+        return
+
+    if sys.argv[1:2] == ["compare"]:
+        from src import compare
+
+        sys.exit(compare.main(sys.argv[2:]))
+
     args = arguments()
 
     queries: list[tuple[str, str]] = []
@@ -176,39 +1011,242 @@ def main():
     if not queries:
         raise ValueError("SQL query is empty")
 
+    if not args.feeder:
+        for file_name, sql_query in queries:
+            if declared_params(sql_query):
+                raise ValueError(f"{file_name} declares parameters; pass --feeder")
+    elif not args.agents:
+        # Agents read their own copy of the feeder, which may not exist here.
+        columns = feeder_columns(args.feeder)
+        for file_name, sql_query in queries:
+            missing = [
+                name for name in declared_params(sql_query) if name not in columns
+            ]
+            if missing:
+                raise ValueError(
+                    f"{file_name} declares parameters the feeder has no column "
+                    f"for: {', '.join(missing)}"
+                )
+
+    # Several values for --instances, --processes or --fetch_size make a sweep:
+    # one run per combination, in turn, on one pool of worker processes.
+    fetch_sizes = args.fetch_size
+    cells = list(itertools.product(args.instances or [0], args.processes, fetch_sizes))
+    sweep = len(cells) > 1
+    args.instances, args.processes, args.fetch_size = cells[0]
+    if sweep and (
+        args.schedule
+        or args.rate > 0
+        or args.find_max
+        or args.agents
+        or args.dispatch == "queue"
+    ):
+        raise ValueError(
+            "A sweep (several --instances, --processes or --fetch_size values) "
+            "cannot be combined with --schedule, --rate, --find_max, --agents "
+            "or --dispatch queue"
+        )
+
+    if args.arrow:
+        if args.database == "mock":
+            raise ValueError("--arrow is only supported for real databases")
+        if 0 in fetch_sizes:
+            raise ValueError("--arrow needs a --fetch_size batch size, or -1")
+        if args.print:
+            raise ValueError("--arrow cannot be combined with --print")
+
+    if args.print_rows < 0:
+        raise ValueError("--print_rows cannot be negative")
+    if args.max_inflight < 0:
+        raise ValueError("--max_inflight cannot be negative")
+    if args.timeout < 0:
+        raise ValueError("--timeout cannot be negative")
+
+    if args.pool and args.pool_min > args.pool_max:
+        raise ValueError("--pool_min cannot be larger than --pool_max")
+
+    mix = parse_mix(args.mix, queries) if args.mix else None
+    warmup_iterations, warmup_duration = (
+        parse_warmup(args.warmup) if args.warmup else (0, 0.0)
+    )
+
+    if args.output:
+        events.output_format(args.output)
+
+    if args.start_method not in multiprocessing.get_all_start_methods():
+        raise ValueError(f"--start_method {args.start_method} is not available here")
+
     processes = resolve_process_count(args.processes)
-    buckets = build_buckets(queries, args.instances, processes)
+    key = None
+    if args.agents:
+        key = distributed.agent_key(args.agent_key)
+        # Every agent runs --processes workers of the one global set, so
+        # buckets, stage shares, feeder shards and the rate split all span the
+        # agents as if they were one big host.
+        processes *= len(args.agents)
+    stages = load_schedule(args.schedule) if args.schedule else None
+    search = None
+    if args.find_max:
+        if args.slo is None or args.slo <= 0:
+            raise ValueError("--find_max requires a positive --slo")
+        if args.probe_duration <= 0:
+            raise ValueError("--probe_duration must be positive")
+        if stages or args.rate > 0 or args.iterations > 0 or args.duration > 0:
+            raise ValueError(
+                "--find_max runs its own probes; it cannot be combined with "
+                "--schedule, --rate, --iterations or --duration"
+            )
+        if args.agents:
+            raise ValueError("--find_max cannot be combined with --agents")
+        if args.find_max == "rate" and args.database == "databricks":
+            raise ValueError(
+                "--find_max rate is only supported for postgres and oracle"
+            )
+
+        start = args.probe_start or processes
+        search = Search(
+            args.find_max,
+            args.slo,
+            args.slo_error_rate,
+            args.probe_duration,
+            start,
+            processes,
+        )
+        if args.find_max == "rate":
+            # Backends run rate probes when they have a rate; every probe then
+            # sets its own per-process share.
+            args.rate = start
 
+        # Like --schedule: every process rotates through every query.
+        buckets = build_buckets(queries, processes, processes)
+    elif stages:
+        if args.rate > 0 or args.iterations > 0:
+            raise ValueError(
+                "--schedule cannot be combined with --rate or --iterations"
+            )
+
+        # Virtual users in every process rotate through every query.
+        buckets = build_buckets(queries, processes, processes)
+    elif args.rate > 0:
+        if args.duration <= 0:
+            raise ValueError("--rate requires a positive --duration")
+        if args.database == "databricks":
+            raise ValueError("--rate is only supported for postgres and oracle")
+        if args.iterations > 0:
+            raise ValueError("--rate and --iterations cannot be combined")
+
+        # Every process cycles through every query, so hand each one a full
+        # copy and split the target rate evenly between them.
+        buckets = build_buckets(queries, processes, processes)
+    else:
+        if not args.instances:
+            raise ValueError(
+                "--instances is required unless --rate or --schedule is set"
+            )
+        buckets = instance_buckets(queries, mix, args.instances, processes)
+
+    chunks = None
+    if args.dispatch == "queue":
+        if (
+            search
+            or stages
+            or args.rate > 0
+            or args.iterations > 0
+            or args.duration > 0
+        ):
+            raise ValueError("--dispatch queue only applies to --instances runs")
+        if args.agents:
+            raise ValueError("--dispatch queue cannot be combined with --agents")
+
+        items = [item for bucket in buckets for item in bucket]
+        if args.longest_first:
+            items = longest_first(items, args.longest_first)
+        chunks = build_chunks(items, args.chunk_size)
+
+    # Settings every backend takes (see src.backend.Backend); the selected one
+    # adds its own connection settings below.
+    db_kwargs = {
+        "printing": args.print,
+        "print_rows": args.print_rows,
+        "log_level": args.log_level,
+        "prefix": args.prefix,
+        "fetch_size": args.fetch_size,
+        "rate": args.rate / len(buckets),
+        "duration": args.duration,
+        "pool": args.pool,
+        "pool_min": args.pool_min,
+        "pool_max": args.pool_max,
+        "iterations": args.iterations,
+        "warmup_iterations": warmup_iterations,
+        "warmup_duration": warmup_duration,
+        "chunk_size": args.chunk_size,
+        "max_inflight": args.max_inflight,
+        "timeout": args.timeout,
+        "think_time": args.think_time,
+        "think_distribution": args.think_distribution,
+        "feeder": args.feeder,
+        "mix": mix,
+        "output": args.output,
+    }
     if args.database == "databricks":
         if not args.server_hostname or not args.http_path:
             raise ValueError("Databricks requires --server_hostname and --http_path")
-        if args.fetch_size == 0:
+        if 0 in fetch_sizes:
             raise ValueError("Databricks does not support fetch_size 0")
 
-        db_factory = DatabricksDB
-        db_kwargs = {
-            "server_hostname": args.server_hostname,
-            "http_path": args.http_path,
-            "access_token": getpass.getpass(prompt="Enter access token: "),
-            "printing": args.print,
-            "prefix": args.prefix,
-            "fetch_size": args.fetch_size,
-        }
+        db_factory = load_backend("databricks")
+        db_kwargs.update(
+            server_hostname=args.server_hostname,
+            http_path=args.http_path,
+            access_token=getpass.getpass(prompt="Enter access token: "),
+            arrow=args.arrow,
+        )
+    elif args.database == "mock":
+        db_factory = load_backend("mock")
+        db_kwargs.update(
+            latency=args.mock_latency,
+            latency_distribution=args.mock_distribution,
+            connect_latency=args.mock_connect_latency,
+            rows=args.mock_rows,
+            row_size=args.mock_row_size,
+        )
     else:
         if not args.dsn or not args.user:
             raise ValueError(f"{args.database} requires --dsn and --user")
-        db_factory = PostgresDB if args.database == "postgres" else OracleDB
-        db_kwargs = {
-            "dsn": args.dsn,
-            "user": args.user,
-            "password": getpass.getpass(prompt="Enter password: "),
-            "printing": args.print,
-            "prefix": args.prefix,
-            "fetch_size": args.fetch_size,
-        }
+        db_factory = load_backend(args.database)
+        db_kwargs.update(
+            dsn=args.dsn,
+            user=args.user,
+            password=getpass.getpass(prompt="Enter password: "),
+            arrow=args.arrow,
+            prepared=not args.unprepared,
+        )
 
     start_time = time.monotonic()
-    execute_queries_concurrently(db_factory, db_kwargs, buckets)
+    if sweep:
+        run_sweep(
+            db_factory,
+            db_kwargs,
+            queries,
+            mix,
+            cells,
+            args.cooldown,
+            args.abort_error_rate,
+            args.start_method,
+        )
+    else:
+        execute_queries_concurrently(
+            db_factory,
+            db_kwargs,
+            buckets,
+            abort_error_rate=args.abort_error_rate,
+            stages=stages,
+            agents=args.agents,
+            agent_key=key,
+            chunks=chunks,
+            search=search,
+            start_method=args.start_method,
+        )
     end_time = time.monotonic()
 
     total_time = end_time - start_time
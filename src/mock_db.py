@@ -0,0 +1,130 @@
+import asyncio
+import math
+import random
+import time
+from datetime import datetime
+
+from src.backend import AsyncBackend
+from src.stats import estimate_bytes
+
+# Print a progress heartbeat every N fetched batches when fetch_size > 0.
+progress_every: int = 5
+
+# Spread of the lognormal latency distribution (sigma of the underlying normal).
+lognormal_sigma: float = 0.5
+
+
+class MockDB(AsyncBackend):
+    """
+    In-process stand-in for a database: no network, no driver. Connecting,
+    executing and fetching just sleep for the configured simulated latencies
+    and hand back synthetic rows. It exercises exactly the same scheduling,
+    timing and reporting paths as the real backends, so it measures the
+    harness's own overhead and lets the tool run offline.
+    """
+
+    name: str = "Mock"
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_distribution: str = "fixed",
+        connect_latency: float = 0.0,
+        rows: int = 0,
+        row_size: int = 100,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        # Simulated server: mean execute latency and its distribution
+        # (fixed/uniform/exponential/lognormal), login cost, and the shape of
+        # the result set every query returns.
+        self.latency: float = latency
+        self.latency_distribution: str = latency_distribution
+        self.connect_latency: float = connect_latency
+        self.rows: int = rows
+        self.row: tuple = (b"x" * row_size,)
+        # Pooling mode: the login cost is paid once per process, up front,
+        # instead of on every query.
+        self.conn_pool: bool = False
+
+    @property
+    def deadline(self) -> float | None:
+        # The simulated server cancels a run the moment it exceeds --timeout.
+        return self.timeout if self.timeout > 0 else None
+
+    def draw_latency(self) -> float:
+        if self.latency <= 0:
+            return 0.0
+        if self.latency_distribution == "uniform":
+            return random.uniform(0, 2 * self.latency)
+        if self.latency_distribution == "exponential":
+            return random.expovariate(1 / self.latency)
+        if self.latency_distribution == "lognormal":
+            mu = math.log(self.latency) - lognormal_sigma**2 / 2
+            return random.lognormvariate(mu, lognormal_sigma)
+
+        return self.latency
+
+    async def open_pool(self):
+        await asyncio.sleep(self.connect_latency)
+        self.conn_pool = True
+
+    async def close_pool(self):
+        self.conn_pool = False
+
+    async def execute_query(
+        self,
+        sql_query: str,
+        file_name: str,
+        timestamps: dict[str, float],
+        params: dict | None = None,
+    ):
+        sql_query = f"{self.prefix}\n{sql_query}"
+
+        if not self.conn_pool and self.connect_latency > 0:
+            await asyncio.sleep(self.connect_latency)
+        self.log.verbose(f"{file_name}: Connected")
+        timestamps["connected"] = time.perf_counter()
+
+        await asyncio.sleep(self.draw_latency())
+        timestamps["executed"] = time.perf_counter()
+
+        rows_fetched = 0
+        bytes_fetched = 0
+        if self.fetch_size != 0:
+            batch_size = self.fetch_size if self.fetch_size > 0 else self.rows
+            batches = 0
+            while True:
+                rows = [self.row] * min(batch_size, self.rows - rows_fetched)
+
+                if batches == 0:
+                    timestamps["first_row"] = time.perf_counter()
+
+                if not rows:
+                    break
+
+                rows_fetched += len(rows)
+                bytes_fetched += estimate_bytes(rows)
+                batches += 1
+
+                # Heartbeat so a long-running fetch is visibly still making
+                # progress (vs genuinely stuck).
+                if self.fetch_size > 0 and batches % progress_every == 0:
+                    now = datetime.now().strftime("%H:%M:%S")
+                    self.log.verbose(
+                        f"[{now}] {file_name}: still fetching... "
+                        f"{rows_fetched} rows so far"
+                    )
+
+                if self.printing:
+                    self.log.rows(file_name, rows)
+
+                # Yield between batches the way a network read would.
+                await asyncio.sleep(0)
+
+        timestamps["fetched"] = time.perf_counter()
+
+        if rows_fetched > 0:
+            self.log.verbose(f"{file_name}: Rows fetched: {rows_fetched}")
+
+        return rows_fetched, bytes_fetched
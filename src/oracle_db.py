@@ -3,121 +3,225 @@ import time
 from datetime import datetime
 
 import oracledb
+from src.backend import AsyncBackend
+from src.stats import estimate_bytes
 
 # Print a progress heartbeat every N fetched batches when fetch_size > 0.
 progress_every: int = 5
 max_fetch_size: int = 100_000_000
 
+# python-oracledb's default statement cache size per connection.
+stmtcachesize: int = 20
+
+
+def oracle_code(e: Exception) -> str:
+    """Error code of a python-oracledb exception, else the exception type."""
+
+    if isinstance(e, oracledb.Error) and e.args:
+        code = getattr(e.args[0], "full_code", None)
+        if code:
+            return code
+
+    return type(e).__name__
+
+
+class OracleDB(AsyncBackend):
+    name: str = "Oracle"
 
-class OracleDB:
     def __init__(
         self,
         dsn: str,
         user: str,
         password: str,
-        printing: bool = False,
-        prefix: str = "",
-        fetch_size: int = 0,
+        arrow: bool = False,
+        prepared: bool = True,
+        **kwargs,
     ):
+        super().__init__(**kwargs)
         self.dsn: str = dsn
         self.user: str = user
         self.password: str = password
-        self.printing: bool = printing
-        self.prefix: str = prefix
-        self.fetch_size: int = fetch_size
+        # Columnar fetch: drain results as Arrow data frames and only count
+        # them, never building a Python object per row.
+        self.arrow: bool = arrow
+        # Reuse each statement's parse/plan within a session (driver statement
+        # cache), or re-parse it on every execution when False.
+        self.prepared: bool = prepared
+        self.conn_pool: oracledb.AsyncConnectionPool | None = None
+
+    @property
+    def stmtcachesize(self) -> int:
+        # The session's statement cache keeps parsed cursors for reuse; 0 makes
+        # every execution parse the statement again.
+        return stmtcachesize if self.prepared else 0
+
+    async def open_pool(self):
+        self.conn_pool = oracledb.create_pool_async(
+            user=self.user,
+            password=self.password,
+            dsn=self.dsn,
+            min=self.pool_min,
+            max=self.pool_max,
+            increment=1,
+            stmtcachesize=self.stmtcachesize,
+        )
+
+        # The pool fills its minimum in the background; check out that many
+        # sessions at once so they are all logged in before we return.
+        connections = await asyncio.gather(
+            *[self.conn_pool.acquire() for _ in range(self.pool_min)]
+        )
+        for connection in connections:
+            await self.conn_pool.release(connection)
+
+    async def close_pool(self):
+        if self.conn_pool:
+            # Forced: a warm-up that failed half way leaves sessions checked out.
+            await self.conn_pool.close(force=True)
+            self.conn_pool = None
+
+    async def connect(self):
+        if self.conn_pool:
+            connection = await self.conn_pool.acquire()
+        else:
+            connection = await oracledb.connect_async(
+                user=self.user,
+                password=self.password,
+                dsn=self.dsn,
+                stmtcachesize=self.stmtcachesize,
+            )
+        if self.timeout > 0:
+            # Breaks off any round trip that takes longer than --timeout.
+            connection.call_timeout = round(self.timeout * 1000)
+
+        return connection
+
+    async def disconnect(self, connection):
+        if self.conn_pool:
+            await self.conn_pool.release(connection)
+        else:
+            await connection.close()
+
+    async def fetch_arrow(
+        self,
+        connection,
+        sql_query: str,
+        params: dict | None,
+        timestamps: dict[str, float],
+    ) -> tuple[int, int]:
+        # Columnar fetch straight into Arrow buffers. Batches are wrapped
+        # zero-copy by pyarrow just to read their size, then dropped.
+        import pyarrow
+
+        async def frames():
+            if self.fetch_size > 0:
+                async for frame in connection.fetch_df_batches(
+                    sql_query, params, self.fetch_size
+                ):
+                    yield frame
+            else:
+                yield await connection.fetch_df_all(sql_query, params)
+
+        rows_fetched = 0
+        bytes_fetched = 0
+        async for frame in frames():
+            if "executed" not in timestamps:
+                # No separate execute step: the first batch marks both.
+                timestamps["executed"] = time.perf_counter()
+                timestamps["first_row"] = timestamps["executed"]
+
+            table = pyarrow.table(frame)
+            rows_fetched += table.num_rows
+            bytes_fetched += table.nbytes
+
+        timestamps["fetched"] = time.perf_counter()
+
+        return rows_fetched, bytes_fetched
 
-    async def execute_query(self, sql_query: str, file_name: str):
+    async def execute_query(
+        self,
+        sql_query: str,
+        file_name: str,
+        timestamps: dict[str, float],
+        params: dict | None = None,
+    ):
         connection = None
         sql_query = f"{self.prefix}\n{sql_query}"
 
         try:
-            connection = await oracledb.connect_async(
-                user=self.user, password=self.password, dsn=self.dsn
-            )
+            connection = await self.connect()
 
             if not connection:
                 raise Exception(f"{file_name}: Could not connect to the database")
             else:
-                print(f"{file_name}: Connected")
+                self.log.verbose(f"{file_name}: Connected")
+            timestamps["connected"] = time.perf_counter()
+
+            if self.arrow:
+                return await self.fetch_arrow(connection, sql_query, params, timestamps)
 
             with connection.cursor(scrollable=True) as cursor:
                 if self.fetch_size != 0:
                     cursor.arraysize = (
                         self.fetch_size if self.fetch_size > 0 else max_fetch_size
                     )
-                await cursor.execute(sql_query)
+                # Named bind variables (:name), filled from the feeder row.
+                await cursor.execute(sql_query, params)
+                timestamps["executed"] = time.perf_counter()
 
                 rows_fetched = 0
+                bytes_fetched = 0
                 if self.fetch_size > 0:
                     batches = 0
                     while True:
                         rows = await cursor.fetchmany(self.fetch_size)
 
+                        if batches == 0:
+                            timestamps["first_row"] = time.perf_counter()
+
                         if not rows:
                             break
 
                         rows_fetched += len(rows)
+                        bytes_fetched += estimate_bytes(rows)
                         batches += 1
 
                         # Heartbeat so a long-running fetch is visibly still
                         # making progress (vs genuinely stuck).
                         if batches % progress_every == 0:
                             now = datetime.now().strftime("%H:%M:%S")
-                            print(
+                            self.log.verbose(
                                 f"[{now}] {file_name}: still fetching... "
                                 f"{rows_fetched} rows so far"
                             )
 
                         if self.printing:
-                            for row in rows:
-                                print(row)
+                            self.log.rows(file_name, rows)
 
                 elif self.fetch_size == -1:
                     rows = await cursor.fetchall()
+                    timestamps["first_row"] = time.perf_counter()
 
                     rows_fetched = len(rows)
+                    bytes_fetched = estimate_bytes(rows)
 
                     if self.printing:
-                        for row in rows:
-                            print(row)
+                        self.log.rows(file_name, rows)
 
                 else:
                     await cursor.scroll(mode="last")
+                    timestamps["first_row"] = time.perf_counter()
+
+                timestamps["fetched"] = time.perf_counter()
 
                 if rows_fetched > 0:
-                    print(f"{file_name}: Rows fetched: {rows_fetched}")
+                    self.log.verbose(f"{file_name}: Rows fetched: {rows_fetched}")
+
+                return rows_fetched, bytes_fetched
 
         finally:
             if connection:
-                await connection.close()
-
-    async def timer(self, sql_query: str, file_name: str):
-        try:
-            start_time = time.time()
-            await self.execute_query(sql_query, file_name)
-            end_time = time.time()
-
-            return end_time - start_time
-
-        except oracledb.DatabaseError as e:
-            print(f"{file_name}: Oracle-Error-Code: {e.args[0].code}")
-            print(f"{file_name}: Oracle-Error-Message: {e.args[0].message}")
-
-    async def executor(self, bucket: list[tuple[str, str]]):
-        tasks = []
-        for file_name, sql in bucket:
-            tasks.append(self.timer(sql, file_name))
-
-        durations = await asyncio.gather(*tasks)
-
-        # Group durations by file name. A query that errored returns None from
-        # timer; skip those so per-file stats only reflect successful runs.
-        results: dict[str, list[float]] = {}
-        for (file_name, _), duration in zip(bucket, durations):
-            if duration is not None:
-                results.setdefault(file_name, []).append(duration)
-
-        return results
+                await self.disconnect(connection)
 
-    def entry(self, bucket: list[tuple[str, str]]):
-        return asyncio.run(self.executor(bucket))
+    def error_code(self, e: Exception) -> str:
+        return oracle_code(e)
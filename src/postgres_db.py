@@ -1,50 +1,163 @@
-import asyncio
+import re
 import time
 from datetime import datetime
 
 import asyncpg
+from src.backend import AsyncBackend
+from src.stats import estimate_bytes
 
 max_fetch_size: int = 100_000_000
 
+# asyncpg's default per-connection prepared statement cache size.
+statement_cache_size: int = 100
+
 # Print a progress heartbeat every N fetched batches when fetch_size > 0.
 progress_every: int = 5
 
 
-class PostgresDB:
+# A statement-ending semicolon followed by a comment on the same line.
+_trailing_semicolon = re.compile(r";\s*--[^']*$")
+
+
+def copy_query(sql_query: str) -> str:
+    """
+    `sql_query` as asyncpg's `COPY ({query}) TO STDOUT` needs it: without its
+    closing semicolon and any comments after it, and ending in a newline so
+    that a `--` comment on the last line cannot swallow the `)`.
+    """
+
+    lines = sql_query.rstrip().splitlines()
+    while lines and (not lines[-1].strip() or lines[-1].lstrip().startswith("--")):
+        lines.pop()
+    if lines:
+        lines[-1] = _trailing_semicolon.sub("", lines[-1])
+
+    return "\n".join(lines).rstrip().rstrip(";").rstrip() + "\n"
+
+
+class PostgresDB(AsyncBackend):
+    name: str = "Postgres"
+
     def __init__(
         self,
         dsn: str,
         user: str,
         password: str,
-        printing: bool = False,
-        prefix: str = "",
-        fetch_size: int = 0,
+        arrow: bool = False,
+        prepared: bool = True,
+        **kwargs,
     ):
+        super().__init__(**kwargs)
         self.dsn: str = dsn
         self.user: str = user
         self.password: str = password
-        self.printing: bool = printing
-        self.prefix: str = prefix
-        self.fetch_size: int = fetch_size
-
-    async def execute_query(self, sql_query: str, file_name: str):
+        # Columnar fetch: stream the result as a binary COPY and only count
+        # its bytes, never building a Python object per row.
+        self.arrow: bool = arrow
+        # Reuse each statement's parse/plan within a session (driver statement
+        # cache), or re-parse it on every execution when False.
+        self.prepared: bool = prepared
+        self.conn_pool: asyncpg.Pool | None = None
+
+    @property
+    def statement_cache_size(self) -> int:
+        # asyncpg prepares every statement once per connection and keeps it in
+        # this cache; 0 makes it parse and plan the statement on each execution.
+        return statement_cache_size if self.prepared else 0
+
+    @property
+    def server_settings(self) -> dict[str, str]:
+        if self.timeout > 0:
+            return {"statement_timeout": f"{self.timeout * 1000:.0f}"}
+
+        return {}
+
+    async def open_pool(self):
+        self.conn_pool = await asyncpg.create_pool(
+            dsn=self.dsn,
+            user=self.user,
+            password=self.password,
+            min_size=self.pool_min,
+            max_size=self.pool_max,
+            statement_cache_size=self.statement_cache_size,
+            server_settings=self.server_settings,
+        )
+
+    async def close_pool(self):
+        if self.conn_pool:
+            await self.conn_pool.close()
+            self.conn_pool = None
+
+    async def connect(self):
+        if self.conn_pool:
+            return await self.conn_pool.acquire()
+
+        return await asyncpg.connect(
+            dsn=self.dsn,
+            user=self.user,
+            password=self.password,
+            statement_cache_size=self.statement_cache_size,
+            server_settings=self.server_settings,
+        )
+
+    async def disconnect(self, conn):
+        if self.conn_pool:
+            await self.conn_pool.release(conn)
+        else:
+            await conn.close()
+
+    async def copy_out(
+        self, conn, sql_query: str, args: list, timestamps: dict[str, float]
+    ) -> tuple[int, int]:
+        # Binary COPY streams the raw result into a sink that only counts the
+        # bytes. The server reports the row count in the COPY status.
+        bytes_fetched = 0
+
+        async def sink(chunk: bytes):
+            nonlocal bytes_fetched
+            if not bytes_fetched:
+                # No separate execute step: the first chunk marks both.
+                timestamps["executed"] = time.perf_counter()
+                timestamps["first_row"] = timestamps["executed"]
+            bytes_fetched += len(chunk)
+
+        status = await conn.copy_from_query(
+            copy_query(sql_query), *args, output=sink, format="binary"
+        )
+        timestamps["fetched"] = time.perf_counter()
+
+        return int(status.split()[-1]), bytes_fetched
+
+    async def execute_query(
+        self,
+        sql_query: str,
+        file_name: str,
+        timestamps: dict[str, float],
+        params: dict | None = None,
+    ):
         conn = None
         sql_query = f"{self.prefix}\n{sql_query}"
 
         try:
-            conn = await asyncpg.connect(
-                dsn=self.dsn, user=self.user, password=self.password
-            )
+            conn = await self.connect()
 
             if not conn:
                 raise Exception(f"{file_name}: Could not connect to the database")
             else:
-                print(f"{file_name}: Connected")
+                self.log.verbose(f"{file_name}: Connected")
+            timestamps["connected"] = time.perf_counter()
 
             async with conn.transaction():
-                cur = await conn.cursor(sql_query)
+                # Parameters are positional ($1, $2, ...) in declared order.
+                args = list(params.values()) if params else []
+                if self.arrow:
+                    return await self.copy_out(conn, sql_query, args, timestamps)
+
+                cur = await conn.cursor(sql_query, *args)
+                timestamps["executed"] = time.perf_counter()
 
                 rows_fetched = 0
+                bytes_fetched = 0
                 batches = 0
                 while True:
                     if self.fetch_size > 0:
@@ -56,8 +169,12 @@ class PostgresDB:
                     else:
                         rows = await cur.forward(max_fetch_size)
 
+                    if batches == 0:
+                        timestamps["first_row"] = time.perf_counter()
+
                     if isinstance(rows, list):
                         rows_fetched += len(rows)
+                        bytes_fetched += estimate_bytes(rows)
                     else:
                         rows_fetched += rows
 
@@ -71,49 +188,27 @@ class PostgresDB:
                     # batched fetch_size > 0 path.
                     if self.fetch_size > 0 and batches % progress_every == 0:
                         now = datetime.now().strftime("%H:%M:%S")
-                        print(
+                        self.log.verbose(
                             f"[{now}] {file_name}: still fetching... "
                             f"{rows_fetched} rows so far"
                         )
 
                     if self.printing:
                         if isinstance(rows, list):
-                            for row in rows:
-                                print(row)
+                            self.log.rows(file_name, rows)
+
+                timestamps["fetched"] = time.perf_counter()
 
                 if rows_fetched > 0:
-                    print(f"{file_name}: {rows_fetched} rows")
+                    self.log.verbose(f"{file_name}: {rows_fetched} rows")
+
+                return rows_fetched, bytes_fetched
 
         finally:
             if conn:
-                await conn.close()
-
-    async def timer(self, sql_query: str, file_name: str):
-        try:
-            start_time = time.time()
-            await self.execute_query(sql_query, file_name)
-            end_time = time.time()
-
-            return end_time - start_time
-
-        except (asyncpg.PostgresError, OSError) as e:
-            print(f"{file_name}: Postgres-Error: {e}")
-
-    async def executor(self, bucket: list[tuple[str, str]]):
-        tasks = []
-        for file_name, sql in bucket:
-            tasks.append(self.timer(sql, file_name))
-
-        durations = await asyncio.gather(*tasks)
-
-        # Group durations by file name. A query that errored returns None from
-        # timer; skip those so per-file stats only reflect successful runs.
-        results: dict[str, list[float]] = {}
-        for (file_name, _), duration in zip(bucket, durations):
-            if duration is not None:
-                results.setdefault(file_name, []).append(duration)
-
-        return results
+                await self.disconnect(conn)
 
-    def entry(self, bucket: list[tuple[str, str]]):
-        return asyncio.run(self.executor(bucket))
+    def error_code(self, e: Exception) -> str:
+        # Server errors carry their SQLSTATE; client-side ones (a refused
+        # connection, a feeder value asyncpg cannot encode) only their type.
+        return getattr(e, "sqlstate", None) or type(e).__name__
@@ -0,0 +1,424 @@
+import asyncio
+import collections
+import itertools
+import json
+import math
+import os
+import random
+import time
+import tomllib
+
+from src.stats import QueryStats, record_run
+
+
+def think_delay(think_time: float, distribution: str = "fixed") -> float:
+    """
+    Pause a virtual user takes between two queries. "exponential" draws from an
+    exponential distribution with mean `think_time` (a Poisson user), anything
+    else is a fixed pause.
+    """
+
+    if think_time <= 0:
+        return 0.0
+    if distribution == "exponential":
+        return random.expovariate(1 / think_time)
+
+    return think_time
+
+
+# Seconds past --timeout before a query is cancelled client-side. The server
+# should have cancelled it at --timeout already, leaving its session usable;
+# this is the backstop for a server (or network) that never answers.
+timeout_grace: float = 1.0
+
+
+def client_timeout(timeout: float) -> float | None:
+    """Client-side deadline for one run under --timeout (None: no limit)."""
+
+    return timeout + timeout_grace if timeout > 0 else None
+
+
+def bounded(run, limit: int):
+    """
+    Wrap an async `run` so that at most `limit` calls are in flight at once;
+    the rest queue for a free slot in arrival order. The time queued counts
+    towards the wait phase, as the intended start is taken before it (0 leaves
+    `run` unbounded).
+    """
+
+    if limit <= 0:
+        return run
+
+    slots = asyncio.Semaphore(limit)
+
+    async def bounded_run(sql: str, file_name: str, intended: float | None = None):
+        if intended is None:
+            intended = time.perf_counter()
+        async with slots:
+            return await run(sql, file_name, intended)
+
+    return bounded_run
+
+
+async def run_loop(
+    run,
+    bucket: list[tuple[str, str]],
+    iterations: int = 0,
+    duration: float = 0,
+    think_time: float = 0,
+    think_distribution: str = "fixed",
+    pick=None,
+):
+    """
+    Closed-loop scheduler: every item in the bucket is one virtual user that
+    runs its query, pauses for the think time, and repeats until it has done
+    `iterations` runs or `duration` seconds have passed, whichever comes first
+    (0 disables that limit). With `pick` (a weighted mix), each iteration runs
+    whatever query `pick()` returns instead of the user's own.
+
+    Returns {file_name: QueryStats} of every run, failed ones by error category.
+    """
+
+    loop = asyncio.get_running_loop()
+    end = loop.time() + duration if duration > 0 else math.inf
+    results: dict[str, QueryStats] = {}
+
+    async def user(file_name: str, sql: str):
+        count = 0
+        while (not iterations or count < iterations) and loop.time() < end:
+            # The user means to send its next query right after the think
+            # time; any lag in waking it up is charged to the response time.
+            intended = time.perf_counter()
+            if count and think_time > 0:
+                intended += think_delay(think_time, think_distribution)
+                await asyncio.sleep(intended - time.perf_counter())
+                if loop.time() >= end:
+                    break
+
+            if pick is not None:
+                file_name, sql = pick()
+
+            durations = await run(sql, file_name, intended)
+            count += 1
+            if durations is not None:
+                record_run(results, file_name, durations)
+
+    await asyncio.gather(*[user(file_name, sql) for file_name, sql in bucket])
+
+    return results
+
+
+async def run_queue(run, work, slots: int):
+    """
+    Work-stealing scheduler: keep `slots` queries in flight, taking the next
+    one whenever a slot frees up. Items come from a local buffer that is
+    refilled with a whole chunk from `work()` (the shared queue, a blocking
+    call) when it runs dry; `work()` returning None means no work is left.
+
+    Returns {file_name: QueryStats} of every run, failed ones by error category.
+    """
+
+    results: dict[str, QueryStats] = {}
+    buffer: collections.deque = collections.deque()
+    lock = asyncio.Lock()
+    exhausted = False
+
+    async def take():
+        nonlocal exhausted
+        async with lock:
+            if not buffer and not exhausted:
+                chunk = await asyncio.to_thread(work)
+                if chunk is None:
+                    exhausted = True
+                else:
+                    buffer.extend(chunk)
+
+            return buffer.popleft() if buffer else None
+
+    async def slot():
+        while (item := await take()) is not None:
+            file_name, sql = item
+            durations = await run(sql, file_name)
+            if durations is not None:
+                record_run(results, file_name, durations)
+
+    await asyncio.gather(*[slot() for _ in range(max(slots, 1))])
+
+    return results
+
+
+async def run_probes(
+    run,
+    bucket: list[tuple[str, str]],
+    probe,
+    rate: bool = False,
+    think_time: float = 0,
+    think_distribution: str = "fixed",
+    pick=None,
+):
+    """
+    Worker side of a --find_max search: run one probe after another, each as a
+    closed-loop stage of this process's share of the concurrency (or as an
+    open-loop run at its share of the rate), until `probe.next()` says stop.
+    Every probe's stats and error count go back through `probe.report`.
+
+    Returns an empty {file_name: QueryStats}; the probes carry the results.
+    """
+
+    errors = 0
+
+    async def counted(sql: str, file_name: str, intended: float | None = None):
+        nonlocal errors
+        durations = await run(sql, file_name, intended)
+        if durations is None or "error" in durations:
+            errors += 1
+        return durations
+
+    while (step := await asyncio.to_thread(probe.next)) is not None:
+        share, duration = step
+        errors = 0
+        if not share:
+            await asyncio.sleep(duration)
+            results = {}
+        elif rate:
+            results = await run_at_rate(counted, bucket, share, duration, pick)
+        else:
+            stages = [(int(share), duration)]
+            results = (
+                await run_stages(
+                    counted, bucket, stages, think_time, think_distribution, pick
+                )
+            )[0]
+        probe.report(results, errors)
+
+    return {}
+
+
+async def warm_up(
+    run,
+    bucket: list[tuple[str, str]],
+    iterations: int = 0,
+    duration: float = 0,
+    pick=None,
+    log=print,
+) -> None:
+    """
+    Warm-up pass before the measured run: the bucket's queries run closed-loop,
+    back to back, for `iterations` runs each or `duration` seconds, and their
+    stats are thrown away. The backend runs it before joining the start
+    barrier, so caches, plans and connections are warm and the measurement
+    window still opens at the same moment in every worker. The summary line goes
+    to `log`.
+    """
+
+    start = time.perf_counter()
+    results = await run_loop(run, bucket, iterations, duration, pick=pick)
+    runs = sum(stats.runs for stats in results.values())
+    log(f"Warm-up: {runs} runs in {time.perf_counter() - start:.2f}s, excluded")
+
+
+async def run_at_rate(
+    run, bucket: list[tuple[str, str]], rate: float, duration: float, pick=None
+):
+    """
+    Open-loop arrival scheduler: launch `run(sql, file_name, intended)` at a
+    fixed rate for `duration` seconds, cycling through the bucket in order, or
+    drawing each arrival's query from `pick()` when a weighted mix is given.
+
+    Arrivals follow a fixed timetable (start + i / rate) and are never held back
+    by earlier queries still in flight, so a slow database shows up as growing
+    latency rather than as a lower request rate. If the loop falls behind (for
+    example after a long GC pause) the overdue arrivals are launched straight
+    away to catch up with the timetable.
+
+    The first arrival is offset by a random fraction of the interval so the
+    worker processes, which all leave the barrier together, do not fire in
+    lock-step bursts.
+
+    Every run is handed its slot in the timetable as the intended start, so
+    time spent waiting for the event loop to get round to it counts towards
+    its response time instead of silently vanishing (coordinated omission).
+
+    Returns {file_name: QueryStats} of every run, failed ones by error category.
+    """
+
+    loop = asyncio.get_running_loop()
+    # Timetable is kept on the loop clock; runs time themselves on perf_counter.
+    offset = time.perf_counter() - loop.time()
+    interval = 1.0 / rate
+    start = loop.time() + random.random() * interval
+    end = loop.time() + duration
+
+    results: dict[str, QueryStats] = {}
+    pending: set[asyncio.Task] = set()
+
+    def collect(task: asyncio.Task, file_name: str):
+        pending.discard(task)
+        if task.cancelled():
+            return
+        # A run that raised instead of returning its failure still counts,
+        # by exception type, rather than vanishing from stats and errors.
+        error = task.exception()
+        durations = {"error": type(error).__name__} if error else task.result()
+        if durations is not None:
+            record_run(results, file_name, durations)
+
+    i = 0
+    while True:
+        intended = start + i * interval
+        if intended >= end:
+            break
+
+        delay = intended - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        file_name, sql = pick() if pick is not None else bucket[i % len(bucket)]
+        task = asyncio.create_task(run(sql, file_name, intended + offset))
+        task.add_done_callback(lambda t, f=file_name: collect(t, f))
+        pending.add(task)
+        i += 1
+
+    # Let the stragglers finish; their results land via the done callbacks.
+    if pending:
+        await asyncio.wait(pending)
+
+    return results
+
+
+def load_schedule(file_path: str) -> list[tuple[int, float]]:
+    """
+    Read a concurrency schedule from a JSON, TOML or YAML file.
+
+    The file holds a list of stages (top-level, or under a "stages" key). Each
+    stage is either a hold at a fixed concurrency:
+
+        {"concurrency": 20, "duration": 60}
+
+    or a ramp expanded into `steps` equal holds from the first to the last
+    concurrency (inclusive), each lasting `duration` seconds:
+
+        {"ramp": [10, 200], "steps": 20, "duration": 60}
+
+    A spike is simply a low hold, a high hold and a low hold again.
+
+    :return: List of (concurrency, duration) stages, in order
+    """
+
+    extension = os.path.splitext(file_path)[1].lower()
+    with open(file_path, "rb") as file:
+        if extension == ".toml":
+            data = tomllib.load(file)
+        elif extension in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("YAML schedules require PyYAML (pip install pyyaml)")
+            data = yaml.safe_load(file)
+        else:
+            data = json.load(file)
+
+    entries = data["stages"] if isinstance(data, dict) else data
+
+    stages: list[tuple[int, float]] = []
+    for entry in entries:
+        duration = float(entry["duration"])
+        if "ramp" in entry:
+            first, last = entry["ramp"]
+            steps = int(entry.get("steps", 1))
+            for step in range(steps):
+                fraction = step / (steps - 1) if steps > 1 else 1
+                stages.append((round(first + (last - first) * fraction), duration))
+        else:
+            stages.append((int(entry["concurrency"]), duration))
+
+    if not stages:
+        raise ValueError(f"{file_path}: schedule has no stages")
+
+    return stages
+
+
+def split_stages(
+    stages: list[tuple[int, float]], index: int, processes: int
+) -> list[tuple[int, float]]:
+    """
+    This process's share of each stage's concurrency. The total is split as
+    evenly as possible; the first `total % processes` processes take one extra
+    virtual user. Durations are unchanged so every process moves through the
+    stages in step.
+    """
+
+    return [
+        (concurrency // processes + (1 if index < concurrency % processes else 0), d)
+        for concurrency, d in stages
+    ]
+
+
+async def run_stages(
+    run,
+    bucket: list[tuple[str, str]],
+    stages: list[tuple[int, float]],
+    think_time: float = 0,
+    think_distribution: str = "fixed",
+    pick=None,
+):
+    """
+    Closed-loop scheduler whose concurrency follows a list of stages.
+
+    Each virtual user loops `run(sql, file_name, intended)`, pausing for the
+    think time between queries and taking them from a rotation through the
+    bucket (or from `pick()` when a weighted mix is given). At every stage
+    boundary the target concurrency changes in place: extra users are started,
+    or users above the new target leave once their current query finishes.
+    Nothing is restarted, so connections and pools carry over from one stage to
+    the next.
+
+    A run is tagged with the stage it started in. Returns one
+    {file_name: QueryStats} dict per stage.
+    """
+
+    results: list[dict[str, QueryStats]] = [{} for _ in stages]
+    rotation = itertools.count()
+    users: dict[int, asyncio.Task] = {}
+    target = 0
+    stage = 0
+
+    async def user(index: int):
+        try:
+            # A user whose index drops out of range after a scale-down simply
+            # stops; if the target grows back in time it carries on instead.
+            first = True
+            while index < target:
+                intended = time.perf_counter()
+                if not first and think_time > 0:
+                    intended += think_delay(think_time, think_distribution)
+                    await asyncio.sleep(intended - time.perf_counter())
+                    if index >= target:
+                        break
+                first = False
+
+                if pick is not None:
+                    file_name, sql = pick()
+                else:
+                    file_name, sql = bucket[next(rotation) % len(bucket)]
+                tag = stage
+                durations = await run(sql, file_name, intended)
+                if durations is not None:
+                    record_run(results[tag], file_name, durations)
+        finally:
+            users.pop(index, None)
+
+    for stage, (concurrency, duration) in enumerate(stages):
+        target = concurrency
+        for index in range(target):
+            if index not in users:
+                users[index] = asyncio.create_task(user(index))
+
+        await asyncio.sleep(duration)
+
+    # Stop issuing new queries and let in-flight ones finish.
+    target = 0
+    if users:
+        await asyncio.wait(list(users.values()))
+
+    return results
@@ -0,0 +1,173 @@
+import math
+
+from src.stats import QueryStats, merge_results, overall_stats
+
+# Hard cap on probes per search, growth and bisection together.
+max_probes: int = 30
+
+# Bisection stops once the bracket between the last passing and the first
+# failing level is this narrow, relative to the passing level.
+resolution: float = 0.05
+
+
+class Probe:
+    """
+    Worker end of a --find_max search. The parent publishes each probe in a
+    shared plan (plan[0] the duration, plan[1 + i] worker i's share of the
+    level) and releases every worker through the shared barrier; each worker
+    runs its share and puts its stats on the results queue.
+    """
+
+    def __init__(self, barrier, plan, results_queue, index: int):
+        self.barrier = barrier
+        self.plan = plan
+        self.results_queue = results_queue
+        self.index: int = index
+
+    def next(self) -> tuple[float, float] | None:
+        """Block until the next probe; (share, seconds), or None when done."""
+
+        self.barrier.wait()
+        duration = self.plan[0]
+        if duration <= 0:
+            return None
+
+        return self.plan[1 + self.index], duration
+
+    def report(self, results: dict[str, QueryStats], errors: int):
+        self.results_queue.put((results, errors))
+
+
+class Search:
+    """
+    Parent end of a --find_max search for the highest concurrency (or arrival
+    rate) whose p99 response time stays under the SLO and whose error rate
+    stays under the limit.
+
+    The level doubles from `start` until a probe fails, then the bracket
+    between the last passing and the first failing level is bisected. Every
+    probe runs on the same worker processes and connections; between probes
+    the workers wait at the barrier for the next plan.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        slo: float,
+        error_limit: float,
+        duration: float,
+        start: float,
+        workers: int,
+    ):
+        self.mode: str = mode
+        self.slo: float = slo
+        self.error_limit: float = error_limit
+        self.duration: float = duration
+        self.start: float = start
+        self.workers: int = workers
+        # (level, stats, errors, passed) per probe, in the order they ran.
+        self.probes: list[tuple[float, QueryStats, int, bool]] = []
+
+    def shares(self, level: float) -> list[float]:
+        if self.mode == "rate":
+            return [level / self.workers] * self.workers
+
+        level = int(level)
+        return [
+            level // self.workers + (1 if i < level % self.workers else 0)
+            for i in range(self.workers)
+        ]
+
+    def run_probe(self, barrier, channel, level: float) -> bool:
+        plan, results_queue = channel
+        plan[0] = self.duration
+        for index, share in enumerate(self.shares(level)):
+            plan[1 + index] = share
+        barrier.wait()
+
+        results: dict[str, QueryStats] = {}
+        errors = 0
+        for _ in range(self.workers):
+            worker_results, worker_errors = results_queue.get()
+            merge_results(results, worker_results)
+            errors += worker_errors
+
+        stats = overall_stats(results)
+        finished = stats.runs + errors
+        passed = (
+            stats.runs > 0
+            and stats.phases["response"].percentile(99) <= self.slo
+            and errors / finished <= self.error_limit
+        )
+        self.probes.append((level, stats, errors, passed))
+        print(
+            f"Probe {len(self.probes)}: {self.mode} {level:g} -> "
+            f"{stats.per_second(stats.runs):.1f} QPS, "
+            f"p99 {stats.phases['response'].percentile(99):.3f}s, "
+            f"{errors} errors: {'pass' if passed else 'FAIL'}"
+        )
+
+        return passed
+
+    def close_enough(self, low: float, high: float) -> bool:
+        if self.mode == "rate":
+            return high - low <= resolution * max(low, self.start)
+
+        return high - low <= max(1, math.floor(resolution * low))
+
+    def control(self, barrier, channel) -> None:
+        """
+        Drive the search from the parent, once the workers have been released
+        from the start barrier, then tell them to stop.
+        """
+
+        plan, _ = channel
+        try:
+            low, high = 0.0, None
+            level = self.start
+            while len(self.probes) < max_probes:
+                if self.run_probe(barrier, channel, level):
+                    low = level
+                else:
+                    high = level
+
+                if high is None:
+                    level = level * 2
+                elif self.close_enough(low, high):
+                    break
+                else:
+                    level = (low + high) / 2
+                    if self.mode != "rate":
+                        level = math.floor(level)
+
+        finally:
+            plan[0] = 0
+            barrier.wait()
+
+    def report(self) -> None:
+        """Print the throughput-vs-latency curve and the knee."""
+
+        print(
+            f"\n{self.mode.capitalize():>11}{'QPS':>10}{'p50':>9}{'p99':>9}"
+            f"{'Errors':>8}  SLO"
+        )
+        for level, stats, errors, passed in sorted(self.probes, key=lambda p: p[0]):
+            response = stats.phases["response"]
+            print(
+                f"{level:>11g}{stats.per_second(stats.runs):>10.1f}"
+                f"{response.percentile(50):>8.3f}s{response.percentile(99):>8.3f}s"
+                f"{errors:>8}  {'pass' if passed else 'FAIL'}"
+            )
+
+        passing = [probe for probe in self.probes if probe[3]]
+        if not passing:
+            print(f"\nNo {self.mode} level met the SLO")
+            return
+
+        level, stats, _, _ = max(passing, key=lambda p: p[0])
+        print(
+            f"\nKnee: {self.mode} {level:g} sustains "
+            f"{stats.per_second(stats.runs):.1f} QPS with p99 "
+            f"{stats.phases['response'].percentile(99):.3f}s "
+            f"(SLO {self.slo:g}s, errors <= {self.error_limit:.1%})"
+        )
@@ -0,0 +1,319 @@
+import math
+import time
+
+# Timestamps recorded for every run, in order, and the phase each consecutive
+# pair of timestamps delimits. "intended" is when the scheduler meant the run
+# to start; "start" and "end" are taken by the backend timer; the others inside
+# execute_query as the run passes each point.
+marks: tuple[str, ...] = (
+    "intended",
+    "start",
+    "connected",
+    "executed",
+    "first_row",
+    "fetched",
+    "end",
+)
+phases: tuple[str, ...] = (
+    "wait",
+    "connect",
+    "execute",
+    "first_row",
+    "fetch",
+    "close",
+)
+
+# Histogram resolution. Buckets grow geometrically by `precision` (1% wide),
+# starting at `lowest` seconds; values are clamped into [lowest, highest].
+# Every histogram shares the same bucket layout, which is what makes them
+# mergeable by simply adding counts.
+precision: float = 0.01
+lowest: float = 1e-6
+highest: float = 1e6
+
+_log_base: float = math.log1p(precision)
+_max_index: int = int(math.log(highest / lowest) / _log_base) + 1
+
+# Percentiles printed by `report`.
+percentiles: tuple[float, ...] = (50, 90, 99, 99.9)
+
+
+def phase_durations(timestamps: dict[str, float]) -> dict[str, float]:
+    """
+    Turn a run's {mark: timestamp} dict into {phase: seconds} plus "total" (the
+    service time, start to end) and "response" (intended start to end). The
+    backend timers add the run's "rows" and "bytes" to the same dict.
+
+    A mark the run never reached (e.g. no fetch in fetch_size 0 mode) is treated
+    as coinciding with the previous one, so that phase counts as zero and the
+    time lands in the next phase that was actually observed. A run without an
+    intended start is taken to have started on time.
+    """
+
+    durations: dict[str, float] = {}
+    previous = timestamps.get("intended", timestamps["start"])
+    for phase, mark in zip(phases, marks[1:]):
+        stamp = timestamps.get(mark, previous)
+        durations[phase] = stamp - previous
+        previous = stamp
+
+    durations["total"] = timestamps["end"] - timestamps["start"]
+    durations["response"] = timestamps["end"] - timestamps.get(
+        "intended", timestamps["start"]
+    )
+
+    return durations
+
+
+def estimate_bytes(rows) -> int:
+    """
+    Cheap size estimate of a fetched batch: the first row's size times the row
+    count, so only one row per batch is looked at. Strings and binary count
+    their length, any other non-null value 8 bytes.
+    """
+
+    if not rows:
+        return 0
+
+    size = 0
+    for value in rows[0]:
+        if isinstance(value, (str, bytes, bytearray, memoryview)):
+            size += len(value)
+        elif value is not None:
+            size += 8
+
+    return size * len(rows)
+
+
+class Histogram:
+    """
+    Compact, mergeable log-bucketed latency histogram (HDR-style).
+
+    Memory is bounded by the number of buckets between `lowest` and `highest`
+    (a few thousand ints at most, usually far fewer since only touched buckets
+    are stored), no matter how many values are recorded. Percentiles are
+    accurate to within `precision` relative error; count, sum, min and max are
+    exact.
+    """
+
+    def __init__(self):
+        self.counts: dict[int, int] = {}
+        self.count: int = 0
+        self.total: float = 0.0
+        self.minimum: float = math.inf
+        self.maximum: float = 0.0
+
+    @staticmethod
+    def index(value: float) -> int:
+        if value <= lowest:
+            return 0
+
+        return min(int(math.log(value / lowest) / _log_base) + 1, _max_index)
+
+    @staticmethod
+    def value(index: int) -> float:
+        """Upper edge of a bucket, i.e. the largest value it can hold."""
+
+        return lowest * (1 + precision) ** index
+
+    def record(self, value: float):
+        index = self.index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other: "Histogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Value at or below which `q` percent of the recorded values fall."""
+
+        if not self.count:
+            return 0.0
+
+        rank = max(math.ceil(self.count * q / 100), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                # Clamp to the exact extremes so p0/p100 are not bucket edges.
+                return min(max(self.value(index), self.minimum), self.maximum)
+
+        return self.maximum
+
+
+class QueryStats:
+    """
+    Aggregate of every run of one query file: one Histogram per phase, plus
+    service time ("total") and response time ("response"), the rows and bytes
+    fetched, and the wall-clock span the runs covered (for throughput). Failed
+    runs only count per error category (see `error_category`).
+    """
+
+    def __init__(self):
+        self.phases: dict[str, Histogram] = {
+            phase: Histogram() for phase in (*phases, "total", "response")
+        }
+        self.rows: int = 0
+        self.bytes: int = 0
+        self.first: float = math.inf
+        self.last: float = 0.0
+        self.errors: dict[str, int] = {}
+
+    @property
+    def runs(self) -> int:
+        return self.phases["total"].count
+
+    @property
+    def failed(self) -> int:
+        return sum(self.errors.values())
+
+    @property
+    def error_rate(self) -> float:
+        finished = self.runs + self.failed
+        return self.failed / finished if finished else 0.0
+
+    @property
+    def window(self) -> float:
+        return max(self.last - self.first, 1e-9) if self.runs else 0.0
+
+    def per_second(self, amount: float) -> float:
+        return amount / self.window if self.runs else 0.0
+
+    def record(self, durations: dict[str, float], finished: float | None = None):
+        """
+        Add one run. `finished` is its wall-clock end; by default the run is
+        taken to have just ended.
+        """
+
+        for phase, histogram in self.phases.items():
+            histogram.record(durations[phase])
+        self.rows += durations.get("rows", 0)
+        self.bytes += durations.get("bytes", 0)
+
+        if finished is None:
+            finished = time.time()
+        self.first = min(self.first, finished - durations["response"])
+        self.last = max(self.last, finished)
+
+    def merge(self, other: "QueryStats"):
+        for phase, histogram in other.phases.items():
+            self.phases[phase].merge(histogram)
+        self.rows += other.rows
+        self.bytes += other.bytes
+        self.first = min(self.first, other.first)
+        self.last = max(self.last, other.last)
+        for category, count in other.errors.items():
+            self.errors[category] = self.errors.get(category, 0) + count
+
+
+def error_category(timestamps: dict[str, float], code: str, timeout: float = 0) -> str:
+    """
+    How a failed run is counted: "timeout" once it has run for the whole
+    --timeout (whichever side cancelled it), "connect" if it never got a
+    connection, and otherwise by its error code (SQLSTATE, ORA-/DPY- code or
+    exception type).
+    """
+
+    if timeout > 0 and timestamps["end"] - timestamps["start"] >= timeout:
+        return "timeout"
+    if "connected" not in timestamps:
+        return "connect"
+
+    return code
+
+
+def record_run(
+    results: dict[str, QueryStats],
+    file_name: str,
+    durations: dict[str, float],
+    finished: float | None = None,
+) -> None:
+    """
+    Add one run's phase durations to the per-file stats in `results`. A failed
+    run comes as {"error": category} and only counts towards that category.
+    """
+
+    stats = results.get(file_name)
+    if stats is None:
+        stats = results[file_name] = QueryStats()
+    if "error" in durations:
+        category = durations["error"]
+        stats.errors[category] = stats.errors.get(category, 0) + 1
+        return
+    stats.record(durations, finished)
+
+
+def overall_stats(results: dict[str, QueryStats]) -> QueryStats:
+    """Roll every file's stats in a {file_name: QueryStats} dict into one."""
+
+    total = QueryStats()
+    for stats in results.values():
+        total.merge(stats)
+
+    return total
+
+
+def mann_whitney(a: Histogram, b: Histogram) -> float:
+    """
+    Two-sided p-value of a Mann-Whitney U test that `a` and `b` come from the
+    same distribution, using the normal approximation.
+
+    Works straight off the histogram buckets: values sharing a bucket are
+    treated as ties, which at 1% bucket width costs next to no power and
+    keeps the test as cheap and memory-bounded as the histograms themselves.
+    """
+
+    n1, n2 = a.count, b.count
+    n = n1 + n2
+    if not n1 or not n2:
+        return 1.0
+
+    rank = 0
+    rank_sum = 0.0
+    ties = 0
+    for index in sorted(a.counts.keys() | b.counts.keys()):
+        in_a = a.counts.get(index, 0)
+        tied = in_a + b.counts.get(index, 0)
+        # Every value in the bucket gets the average of the ranks it spans.
+        rank_sum += in_a * (rank + (tied + 1) / 2)
+        ties += tied**3 - tied
+        rank += tied
+
+    u = rank_sum - n1 * (n1 + 1) / 2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+
+    z = max(abs(u - n1 * n2 / 2) - 0.5, 0) / math.sqrt(variance)
+    return math.erfc(z / math.sqrt(2))
+
+
+def merge_results(target: dict[str, QueryStats], source: dict[str, QueryStats]) -> None:
+    """Merge a worker's {file_name: QueryStats} dict into the running total."""
+
+    for file_name, stats in source.items():
+        if file_name in target:
+            target[file_name].merge(stats)
+        else:
+            target[file_name] = stats
+
+
+def merge_stage_results(
+    target: list[dict[str, QueryStats]], source: list[dict[str, QueryStats]]
+) -> None:
+    """Merge a worker's per-stage results into the running per-stage totals."""
+
+    for stage_target, stage_source in zip(target, source):
+        merge_results(stage_target, stage_source)
@@ -0,0 +1,48 @@
+import random
+
+from src import compare
+from src.events import EventWriter
+
+
+def write_run(path, latency: float, runs: int = 300, errors: int = 0):
+    """An --output file of `runs` runs of a.sql around `latency` seconds."""
+
+    writer = EventWriter(str(path))
+    for index in range(runs):
+        start = index * 0.1
+        end = start + random.gauss(latency, latency / 20)
+        timestamps = {"intended": start, "start": start, "connected": start}
+        timestamps.update(executed=end, first_row=end, fetched=end, end=end)
+        writer.record("a.sql", timestamps)
+    for _ in range(errors):
+        writer.record("a.sql", {"start": 0.0, "end": 1.0}, error="timeout")
+    # Warm-up runs are left out, however slow.
+    writer.record("a.sql", {"start": 0.0, "end": 60.0}, warmup=True)
+    writer.close()
+    return str(path)
+
+
+def test_same_latency_passes(tmp_path, capsys):
+    random.seed(1)
+    baseline = write_run(tmp_path / "baseline.csv", 0.010)
+    candidate = write_run(tmp_path / "candidate.csv", 0.010, errors=2)
+
+    assert compare.main([baseline, candidate]) == 0
+    assert "Regressed" not in capsys.readouterr().out
+
+
+def test_slower_candidate_fails(tmp_path, capsys):
+    random.seed(2)
+    baseline = write_run(tmp_path / "baseline.jsonl", 0.010)
+    candidate = write_run(tmp_path / "candidate.jsonl", 0.015)
+
+    assert compare.main([baseline, candidate]) == 1
+    assert "Regressed: a.sql, overall" in capsys.readouterr().out
+
+
+def test_threshold_tolerates_a_small_slowdown(tmp_path):
+    random.seed(3)
+    baseline = write_run(tmp_path / "baseline.csv", 0.010)
+    candidate = write_run(tmp_path / "candidate.csv", 0.0105)
+
+    assert compare.main([baseline, candidate, "--threshold", "20"]) == 0
@@ -0,0 +1,35 @@
+from databricks.sql import exc
+
+from src.databricks_db import DatabricksDB, databricks_code
+
+
+def test_databricks_code():
+    not_found = exc.ServerOperationError(
+        "[TABLE_OR_VIEW_NOT_FOUND] The table `t` cannot be found. SQLSTATE: 42P01"
+    )
+
+    assert databricks_code(not_found) == "42P01"
+    assert databricks_code(exc.ServerOperationError("[DIVIDE_BY_ZERO] x")) == (
+        "DIVIDE_BY_ZERO"
+    )
+    assert databricks_code(exc.RequestError("boom")) == "RequestError"
+    assert databricks_code(ValueError("SQLSTATE: 42P01")) == "ValueError"
+
+
+def test_failed_runs_are_counted_by_code():
+    db = DatabricksDB("host", "path", "token", log_level="quiet")
+
+    def execute_query(sql_query, file_name, timestamps, params=None):
+        timestamps["connected"] = timestamps["start"]
+        if sql_query == "x":
+            raise exc.ServerOperationError("[X] SQLSTATE: 22012")
+        for mark in ("executed", "first_row", "fetched"):
+            timestamps[mark] = timestamps["start"]
+        return 3, 30
+
+    db.execute_query = execute_query
+    results = db.executor([("a.sql", "x"), ("a.sql", "y"), ("b.sql", "z")])
+
+    assert results["a.sql"].runs == 1 and results["a.sql"].errors == {"22012": 1}
+    assert results["a.sql"].rows == 3
+    assert results["b.sql"].runs == 1 and not results["b.sql"].errors
@@ -0,0 +1,80 @@
+import multiprocessing
+import socket
+import time
+from multiprocessing.connection import Client
+
+import pytest
+
+from src import distributed, events
+from src.main import build_payloads
+from src.mock_db import MockDB
+
+key = b"test key"
+bucket = [("a.sql", "select 1"), ("b.sql", "select 2")]
+
+
+def free_address() -> tuple[str, int]:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()
+
+
+@pytest.fixture
+def agents():
+    addresses = [free_address() for _ in range(2)]
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=distributed.serve, args=(address, key))
+        for address in addresses
+    ]
+    for process in processes:
+        process.start()
+
+    # Wait until both are listening; a refused probe leaves nothing behind.
+    for address in addresses:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                Client(address, authkey=key).close()
+                break
+            except ConnectionRefusedError:
+                assert time.monotonic() < deadline, "agent did not start"
+                time.sleep(0.1)
+
+    yield [f"{host}:{port}" for host, port in addresses]
+
+    for process in processes:
+        process.terminate()
+        process.join()
+
+
+def test_coordinated_run_across_agents(agents, tmp_path, monkeypatch):
+    monkeypatch.setattr(distributed, "start_delay", 0.2)
+    output = str(tmp_path / "events.csv")
+    payloads = build_payloads(
+        MockDB, {"output": output, "log_level": "quiet"}, [bucket] * 4
+    )
+
+    results, aborted = distributed.coordinate(agents, key, payloads, output=output)
+
+    assert not aborted
+    assert results["a.sql"].runs == results["b.sql"].runs == 4
+    # Every agent's events come back into the one file here.
+    workers = [event["worker"] for event in events.read(output)]
+    assert sorted(workers) == [0, 0, 1, 1, 2, 2, 3, 3]
+    assert list(tmp_path.iterdir()) == [tmp_path / "events.csv"]
+
+
+def test_agent_error_reaches_the_coordinator(agents, monkeypatch):
+    monkeypatch.setattr(distributed, "start_delay", 0.2)
+    payloads = build_payloads(MockDB, {"no_such_setting": 1}, [bucket] * 2)
+
+    with pytest.raises(RuntimeError, match=agents[0]):
+        distributed.coordinate(agents, key, payloads)
+
+
+def test_wrong_key_is_refused(agents):
+    host, port = distributed.parse_address(agents[0])
+
+    with pytest.raises(multiprocessing.AuthenticationError):
+        Client((host, port), authkey=b"wrong key")
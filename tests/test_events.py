@@ -0,0 +1,73 @@
+import pytest
+
+from src import events
+from src.events import EventWriter, part_path
+
+timestamps = {"intended": 1.0, "start": 1.5, "connected": 2.0, "end": 3.0}
+
+
+def write(path, worker_id, runs):
+    writer = EventWriter(str(path), worker_id)
+    for index in range(runs):
+        writer.record(f"q{index}.sql", timestamps, rows=index, size=10 * index)
+    writer.record("bad.sql", {"start": 1.0, "end": 2.0}, error="timeout")
+    writer.record("warm.sql", timestamps, warmup=True)
+    writer.close()
+    return writer.epoch
+
+
+@pytest.mark.parametrize("extension", [".csv", ".jsonl", ".parquet"])
+def test_round_trip(tmp_path, extension):
+    if extension == ".parquet":
+        pytest.importorskip("pyarrow")
+    path = tmp_path / f"events{extension}"
+    epoch = write(path, 3, 2)
+
+    read = list(events.read(str(path)))
+
+    assert [event["file"] for event in read] == [
+        "q0.sql",
+        "q1.sql",
+        "bad.sql",
+        "warm.sql",
+    ]
+    assert all(event["worker"] == 3 for event in read)
+    assert read[1]["rows"] == 1 and read[1]["bytes"] == 10
+    assert read[1]["start"] == pytest.approx(1.5 + epoch)
+    assert read[1]["executed"] is None
+    assert read[2]["error"] == "timeout" and read[2]["connected"] is None
+    assert read[0]["error"] is None
+    assert [event["warmup"] for event in read] == [False, False, False, True]
+    assert set(read[0]) == set(events.columns)
+
+
+@pytest.mark.parametrize("extension", [".csv", ".jsonl", ".parquet"])
+def test_combine_parts(tmp_path, extension, monkeypatch):
+    if extension == ".parquet":
+        pytest.importorskip("pyarrow")
+    # Small chunks, so every part is written out in several pieces.
+    monkeypatch.setattr(events, "chunk_rows", 3)
+    path = str(tmp_path / f"events{extension}")
+    parts = [part_path(path, worker_id) for worker_id in range(3)]
+    for worker_id, part in enumerate(parts):
+        write(part, worker_id, 4 + worker_id)
+
+    events.combine(path, parts + [part_path(path, 9)])
+
+    read = list(events.read(path))
+    assert len(read) == 6 + 7 + 8
+    assert [event["worker"] for event in read] == [0] * 6 + [1] * 7 + [2] * 8
+    assert list(tmp_path.iterdir()) == [tmp_path / f"events{extension}"]
+
+
+def test_empty_stream_still_writes_a_file(tmp_path):
+    path = tmp_path / "events.csv"
+    EventWriter(str(path)).close()
+
+    assert path.read_text().strip() == ",".join(events.columns)
+    assert list(events.read(str(path))) == []
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError, match="must end in"):
+        EventWriter("events.txt")
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from src.feeder import Feeder, declared_params, feeder_columns
+from src.mock_db import MockDB
+
+query = "-- params: id, name\nselect * from t where id = $1 and name = $2"
+
+
+def write_rows(path, count):
+    path.write_text("id,name\n" + "".join(f"{i},n{i}\n" for i in range(count)))
+    return str(path)
+
+
+def test_declared_params():
+    assert declared_params(query) == ("id", "name")
+    assert declared_params("select 1") == ()
+
+
+def test_shards_are_disjoint_and_cover_the_file(tmp_path):
+    path = write_rows(tmp_path / "rows.csv", 10)
+    seen = []
+    for shard in range(3):
+        feeder = Feeder(path, shard, 3)
+        expected = [str(i) for i in range(shard, 10, 3)]
+        rows = [feeder.bind(query)["id"] for _ in expected]
+        assert rows == expected
+        seen += rows
+
+    assert sorted(seen, key=int) == [str(i) for i in range(10)]
+
+
+def test_shard_wraps_around(tmp_path):
+    feeder = Feeder(write_rows(tmp_path / "rows.csv", 4), 1, 2)
+    rows = [feeder.bind(query)["id"] for _ in range(5)]
+
+    assert rows == ["1", "3", "1", "3", "1"]
+
+
+def test_more_shards_than_rows_share_the_file(tmp_path):
+    feeder = Feeder(write_rows(tmp_path / "rows.csv", 2), 5, 8)
+    rows = [feeder.bind(query)["id"] for _ in range(3)]
+
+    assert rows == ["0", "1", "0"]
+
+
+def test_jsonl_keeps_types(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    path.write_text('{"id": 1, "name": "a"}\n\n{"id": 2, "name": "b"}\n')
+    feeder = Feeder(str(path))
+
+    assert feeder.bind(query) == {"id": 1, "name": "a"}
+    assert feeder.bind(query) == {"id": 2, "name": "b"}
+    assert feeder.bind("select 1") is None
+
+
+def test_missing_column_and_empty_file(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text("id\n1\n")
+    with pytest.raises(ValueError, match="no column 'name'"):
+        Feeder(str(path)).bind(query)
+
+    path.write_text("id,name\n")
+    with pytest.raises(ValueError, match="no rows"):
+        Feeder(str(path)).bind(query)
+
+
+def test_jsonl_shards_decode_only_their_lines(tmp_path, monkeypatch):
+    path = tmp_path / "rows.jsonl"
+    path.write_text("".join(f'{{"id": {i}, "name": "n{i}"}}\n' for i in range(9)))
+    decoded = []
+    loads = json.loads
+    monkeypatch.setattr(json, "loads", lambda line: decoded.append(line) or loads(line))
+
+    feeder = Feeder(str(path), 2, 3)
+    rows = [feeder.bind(query)["id"] for _ in range(3)]
+
+    assert rows == [2, 5, 8]
+    assert len(decoded) == 3
+
+
+def test_feeder_columns(tmp_path):
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_text("id,name\n1,a\n")
+    jsonl_path = tmp_path / "rows.jsonl"
+    jsonl_path.write_text('\n{"id": 1}\n{"id": 2, "name": "b"}\n')
+
+    assert feeder_columns(str(csv_path)) == {"id", "name"}
+    assert feeder_columns(str(jsonl_path)) == {"id"}
+
+
+def test_row_without_a_parameter_fails_the_run(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    path.write_text('{"id": 1, "name": "a"}\n{"id": 2}\n')
+    db = MockDB(feeder=str(path), log_level="quiet")
+
+    results = db.entry([("p.sql", query), ("p.sql", query)])
+
+    assert results["p.sql"].runs == 1
+    assert results["p.sql"].errors == {"feeder": 1}
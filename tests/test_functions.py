@@ -0,0 +1,49 @@
+import random
+from collections import Counter
+
+import pytest
+
+from src.functions import WeightedSampler, parse_mix
+
+queries = [("a.sql", "select 1"), ("b.sql", "select 2"), ("c.sql", "select 3")]
+
+
+def test_sampler_follows_weights():
+    random.seed(1)
+    sampler = WeightedSampler(["a", "b", "c"], [1, 2, 7])
+    drawn = Counter(sampler.sample() for _ in range(100_000))
+
+    assert abs(drawn["a"] / 100_000 - 0.1) < 0.01
+    assert abs(drawn["b"] / 100_000 - 0.2) < 0.01
+    assert abs(drawn["c"] / 100_000 - 0.7) < 0.01
+
+
+def test_sampler_never_draws_zero_weight():
+    random.seed(2)
+    sampler = WeightedSampler(["a", "b"], [0, 1])
+
+    assert {sampler.sample() for _ in range(1000)} == {"b"}
+
+
+def test_sampler_needs_a_positive_weight():
+    with pytest.raises(ValueError):
+        WeightedSampler(["a"], [0])
+    with pytest.raises(ValueError):
+        WeightedSampler([], [])
+
+
+def test_parse_mix_defaults_to_weight_one():
+    mix = parse_mix(["queries/a.sql@3", "c.sql@0"], queries)
+
+    assert mix == [
+        ("a.sql", "select 1", 3.0),
+        ("b.sql", "select 2", 1.0),
+        ("c.sql", "select 3", 0.0),
+    ]
+
+
+def test_parse_mix_rejects_bad_specs():
+    with pytest.raises(ValueError, match="expected file@weight"):
+        parse_mix(["a.sql"], queries)
+    with pytest.raises(ValueError, match="unknown query files: d.sql"):
+        parse_mix(["d.sql@1"], queries)
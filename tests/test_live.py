@@ -0,0 +1,72 @@
+import queue
+
+import pytest
+
+from src import events, live
+from src.live import LiveMetrics
+from src.mock_db import MockDB
+
+
+@pytest.fixture
+def metrics_queue(monkeypatch):
+    # Only the test publishes; the background thread never wakes up.
+    monkeypatch.setattr(live, "interval", 3600)
+    return queue.Queue()
+
+
+def drain(metrics_queue) -> list:
+    messages = []
+    while not metrics_queue.empty():
+        messages.append(metrics_queue.get_nowait())
+    return messages
+
+
+def test_counts_per_interval_until_the_final_message(metrics_queue):
+    metrics = LiveMetrics(metrics_queue)
+    metrics.begin()
+
+    for _ in range(3):
+        metrics.started()
+    metrics.finished({"response": 0.01})
+    metrics.finished({"error": "timeout"})
+    metrics.publish()
+    metrics.finished({"response": 0.02})
+    metrics.publish(final=True)
+    # A finished job publishes nothing more until the next one begins.
+    metrics.publish()
+
+    first, last = drain(metrics_queue)
+    # (pid, completed, errors, in_flight, histogram, resources, final)
+    assert first[1:4] == (1, 1, 1) and first[4].count == 1 and not first[6]
+    assert last[1:4] == (1, 0, 0) and last[4].count == 1 and last[6]
+
+
+def test_begin_starts_afresh(metrics_queue):
+    metrics = LiveMetrics(metrics_queue)
+    metrics.begin()
+    metrics.started()
+    metrics.finished({"response": 0.01})
+    metrics.started()
+
+    metrics.begin()
+    metrics.publish(final=True)
+
+    (message,) = drain(metrics_queue)
+    assert message[1:4] == (0, 0, 0) and message[4].count == 0 and message[6]
+
+
+def test_warm_up_stays_out_of_the_live_metrics(metrics_queue, monkeypatch, tmp_path):
+    monkeypatch.setattr(live, "_metrics", None)
+    live.install(metrics_queue)
+    path = str(tmp_path / "events.jsonl")
+    db = MockDB(iterations=3, warmup_iterations=2, output=path, log_level="quiet")
+
+    live.begin()
+    results = db.entry([("a.sql", "select 1")])
+    live.flush()
+
+    assert results["a.sql"].runs == 3
+    assert sum(message[1] for message in drain(metrics_queue)) == 3
+    # Still in --output, tagged.
+    warmup = [event["warmup"] for event in events.read(path)]
+    assert warmup == [True, True, False, False, False]
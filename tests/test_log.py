@@ -0,0 +1,32 @@
+from src.log import Logger
+
+
+def test_levels_and_buffering(capsys):
+    log = Logger("summary")
+    log.summary("pool warmed")
+    log.verbose("a.sql: Connected")
+
+    # Nothing reaches stdout until the buffer is flushed.
+    assert capsys.readouterr().out == ""
+    log.close()
+    assert capsys.readouterr().out == "pool warmed\n"
+
+
+def test_quiet_prints_nothing(capsys):
+    log = Logger("quiet")
+    log.summary("pool warmed")
+    log.verbose("a.sql: Connected")
+    log.close()
+
+    assert capsys.readouterr().out == ""
+    assert log.thread is None
+
+
+def test_rows_are_capped_per_file(capsys):
+    log = Logger("summary", row_limit=3)
+    log.rows("a.sql", [(1,), (2,)])
+    log.rows("a.sql", [(3,), (4,)])
+    log.rows("b.sql", [(5,)])
+    log.close()
+
+    assert capsys.readouterr().out == "(1,)\n(2,)\n(3,)\n(5,)\n"
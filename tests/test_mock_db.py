@@ -0,0 +1,70 @@
+from src import events
+from src.main import run_workers
+from src.mock_db import MockDB
+
+bucket = [("a.sql", "select 1"), ("b.sql", "select 2"), ("a.sql", "select 1")]
+
+
+def test_one_shot_run(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    db = MockDB(
+        latency=0.01, rows=5, row_size=10, fetch_size=2, output=path, log_level="quiet"
+    )
+
+    results = db.entry(bucket)
+
+    assert sorted(results) == ["a.sql", "b.sql"]
+    assert results["a.sql"].runs == 2 and results["b.sql"].runs == 1
+    assert results["a.sql"].rows == 10
+    assert results["a.sql"].phases["total"].minimum >= 0.01
+    assert [event["file"] for event in events.read(path)] == [
+        "a.sql",
+        "b.sql",
+        "a.sql",
+    ]
+
+
+def test_timeouts_are_counted_as_errors():
+    db = MockDB(latency=0.5, timeout=0.05, log_level="quiet")
+
+    results = db.entry(bucket)
+
+    assert results["a.sql"].runs == 0
+    assert results["a.sql"].errors == {"timeout": 2}
+    assert results["b.sql"].errors == {"timeout": 1}
+
+
+def test_loop_with_warmup():
+    db = MockDB(iterations=3, warmup_iterations=2, log_level="quiet")
+
+    results = db.entry(bucket[:2])
+
+    assert results["a.sql"].runs == 3 and results["b.sql"].runs == 3
+
+
+def test_workers_end_to_end(tmp_path):
+    path = str(tmp_path / "events.csv")
+    db_kwargs = {"latency": 0.01, "pool": True, "output": path, "log_level": "quiet"}
+
+    results, aborted = run_workers(MockDB, db_kwargs, [bucket, bucket], dashboard=False)
+
+    assert not aborted
+    assert results["a.sql"].runs == 4 and results["b.sql"].runs == 2
+    assert results["a.sql"].failed == 0
+    assert sorted(event["worker"] for event in events.read(path)) == [0] * 3 + [1] * 3
+    assert list(tmp_path.iterdir()) == [tmp_path / "events.csv"]
+
+
+class BrokenPool(MockDB):
+    async def open_pool(self):
+        raise OSError("connection refused")
+
+
+def test_pool_that_cannot_open_fails_every_run_as_connect():
+    db = BrokenPool(pool=True, log_level="quiet")
+
+    results = db.entry(bucket)
+
+    assert results["a.sql"].runs == 0
+    assert results["a.sql"].errors == {"connect": 2}
+    assert db.pool_error == "connection refused"
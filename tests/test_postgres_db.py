@@ -0,0 +1,34 @@
+import pytest
+
+from src.postgres_db import copy_query
+
+
+@pytest.mark.parametrize(
+    "sql_query",
+    [
+        "select 1",
+        "select 1;\n",
+        "select 1 ;; \n\n",
+        "select 1 -- one row",
+        "select 1; -- one row",
+        "select 1;\n-- done\n\n-- really\n",
+        "select 1\n-- done",
+    ],
+)
+def test_copy_query_survives_trailing_comments(sql_query):
+    query = copy_query(sql_query)
+    wrapped = f"COPY ({query}) TO STDOUT"
+
+    assert query.startswith("select 1")
+    assert ";" not in query
+    # Whatever comment remains ends before the closing parenthesis.
+    assert wrapped.splitlines()[-1] == ") TO STDOUT"
+
+
+def test_copy_query_keeps_the_body():
+    sql_query = "-- params: id\nselect ';--' as s\nfrom t where id = $1;\n-- end"
+
+    assert (
+        copy_query(sql_query)
+        == "-- params: id\nselect ';--' as s\nfrom t where id = $1\n"
+    )
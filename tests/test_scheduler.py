@@ -0,0 +1,277 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from src.scheduler import (
+    bounded,
+    load_schedule,
+    run_at_rate,
+    run_loop,
+    run_queue,
+    run_stages,
+    split_stages,
+)
+from src.stats import marks, phase_durations
+
+bucket = [("a.sql", "select 1"), ("b.sql", "select 2")]
+
+
+def succeeded(intended: float, latency: float = 0.001) -> dict[str, float]:
+    """Durations of a successful run, as a backend's timer returns them."""
+
+    timestamps = {mark: intended for mark in marks}
+    timestamps["end"] = intended + latency
+    return phase_durations(timestamps)
+
+
+class FakeRun:
+    """A `run` coroutine that sleeps for `latency` and records every call."""
+
+    def __init__(self, latency: float = 0.001):
+        self.latency: float = latency
+        # (file_name, intended, actual start) per call.
+        self.calls: list[tuple[str, float, float]] = []
+        self.in_flight: int = 0
+        self.peak: int = 0
+
+    async def __call__(self, sql: str, file_name: str, intended: float | None = None):
+        self.calls.append((file_name, intended, time.perf_counter()))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return succeeded(time.perf_counter(), self.latency)
+
+
+def test_rate_follows_the_timetable():
+    run = FakeRun(latency=0.05)
+
+    results = asyncio.run(run_at_rate(run, bucket, rate=100, duration=0.3))
+
+    intended = [when for _, when, _ in run.calls]
+    assert len(intended) == 30
+    gaps = [b - a for a, b in zip(intended, intended[1:])]
+    assert gaps == pytest.approx([0.01] * 29)
+    # Arrivals are not held back by the runs still in flight.
+    assert run.peak > 1
+    assert [file_name for file_name, _, _ in run.calls[:4]] == [
+        "a.sql",
+        "b.sql",
+        "a.sql",
+        "b.sql",
+    ]
+    assert results["a.sql"].runs == results["b.sql"].runs == 15
+
+
+def test_rate_catches_up_after_a_stall():
+    run = FakeRun()
+
+    async def stalled():
+        async def stall():
+            await asyncio.sleep(0.05)
+            # Blocks the event loop, as a long GC pause would.
+            time.sleep(0.1)
+
+        stalling = asyncio.create_task(stall())
+        results = await run_at_rate(run, bucket, rate=100, duration=0.3)
+        await stalling
+        return results
+
+    results = asyncio.run(stalled())
+
+    # Nothing is dropped: the overdue arrivals go out straight away, each with
+    # its slot in the timetable as the intended start.
+    intended = [when for _, when, _ in run.calls]
+    assert len(intended) == 30
+    assert [b - a for a, b in zip(intended, intended[1:])] == pytest.approx([0.01] * 29)
+    assert sum(stats.runs for stats in results.values()) == 30
+    assert max(started - when for _, when, started in run.calls) > 0.05
+
+
+def test_loop_runs_each_user_for_its_iterations():
+    run = FakeRun()
+
+    results = asyncio.run(run_loop(run, bucket, iterations=3, think_time=0.02))
+
+    assert results["a.sql"].runs == results["b.sql"].runs == 3
+    # After the first query, each user means to start its next one a think
+    # time after the previous one finished.
+    a_intended = [when for file_name, when, _ in run.calls if file_name == "a.sql"]
+    assert all(b - a >= 0.02 for a, b in zip(a_intended, a_intended[1:]))
+
+
+def test_loop_stops_at_the_duration():
+    run = FakeRun(latency=0.01)
+
+    start = time.perf_counter()
+    results = asyncio.run(run_loop(run, bucket, duration=0.2))
+    elapsed = time.perf_counter() - start
+
+    assert 0.2 <= elapsed < 0.3
+    assert 10 <= results["a.sql"].runs <= 20
+
+
+def test_load_schedule_holds_and_ramps(tmp_path):
+    path = tmp_path / "schedule.json"
+    path.write_text(
+        json.dumps(
+            {
+                "stages": [
+                    {"concurrency": 5, "duration": 10},
+                    {"ramp": [10, 40], "steps": 4, "duration": 30},
+                    {"ramp": [1, 8], "duration": 2},
+                ]
+            }
+        )
+    )
+
+    assert load_schedule(str(path)) == [
+        (5, 10.0),
+        (10, 30.0),
+        (20, 30.0),
+        (30, 30.0),
+        (40, 30.0),
+        (8, 2.0),
+    ]
+
+
+def test_load_schedule_toml_list(tmp_path):
+    path = tmp_path / "schedule.toml"
+    path.write_text(
+        "[[stages]]\nconcurrency = 2\nduration = 1.5\n"
+        "[[stages]]\nconcurrency = 4\nduration = 3\n"
+    )
+
+    assert load_schedule(str(path)) == [(2, 1.5), (4, 3.0)]
+
+
+def test_load_schedule_needs_stages(tmp_path):
+    path = tmp_path / "schedule.json"
+    path.write_text("[]")
+
+    with pytest.raises(ValueError, match="no stages"):
+        load_schedule(str(path))
+
+
+def test_split_stages_shares_every_user():
+    stages = [(10, 5.0), (3, 1.0), (0, 2.0)]
+    shares = [split_stages(stages, index, 4) for index in range(4)]
+
+    assert shares[0] == [(3, 5.0), (1, 1.0), (0, 2.0)]
+    assert shares[3] == [(2, 5.0), (0, 1.0), (0, 2.0)]
+    for stage, (concurrency, duration) in enumerate(stages):
+        assert sum(share[stage][0] for share in shares) == concurrency
+        assert all(share[stage][1] == duration for share in shares)
+
+
+def test_stages_scale_down_in_place():
+    run = FakeRun(latency=0.01)
+    # (seconds into the run, queries in flight), sampled every 5 ms.
+    samples = []
+
+    async def staged():
+        start = time.perf_counter()
+
+        async def watch():
+            while True:
+                samples.append((time.perf_counter() - start, run.in_flight))
+                await asyncio.sleep(0.005)
+
+        watcher = asyncio.create_task(watch())
+        results = await run_stages(run, bucket, [(4, 0.2), (1, 0.2)])
+        watcher.cancel()
+        return results
+
+    first, second = asyncio.run(staged())
+
+    assert run.peak == 4
+    # Users above the new target leave once their current query is done.
+    assert max(count for when, count in samples if when > 0.25) == 1
+    assert sum(stats.runs for stats in first.values()) > sum(
+        stats.runs for stats in second.values()
+    )
+
+
+def test_runs_count_in_the_stage_they_started_in():
+    # Each run outlasts the stage it started in.
+    run = FakeRun(latency=0.15)
+
+    first, second = asyncio.run(run_stages(run, bucket, [(1, 0.1), (1, 0.1)]))
+
+    assert [stats.runs for stats in first.values()] == [1]
+    assert [stats.runs for stats in second.values()] == [1]
+    assert len(run.calls) == 2
+
+
+def test_queue_runs_every_item_once_then_stops():
+    run = FakeRun(latency=0.005)
+    chunks = [[(f"{i}.sql", "select 1") for i in range(j, j + 3)] for j in (0, 3, 6)]
+    pulls = []
+
+    def work():
+        # The shared queue: one chunk per pull, then None once it is empty.
+        pulls.append(len(chunks))
+        return chunks.pop(0) if chunks else None
+
+    results = asyncio.run(run_queue(run, work, slots=4))
+
+    assert sorted(file_name for file_name, _, _ in run.calls) == sorted(
+        f"{i}.sql" for i in range(9)
+    )
+    assert all(stats.runs == 1 for stats in results.values())
+    # Slots stop pulling as soon as one of them has seen the queue run dry.
+    assert pulls == [3, 2, 1, 0]
+    assert run.peak <= 4
+
+
+def test_queue_keeps_every_slot_busy():
+    run = FakeRun(latency=0.02)
+    chunks = [[("a.sql", "select 1")] * 2 for _ in range(8)]
+
+    start = time.perf_counter()
+    asyncio.run(run_queue(run, lambda: chunks.pop() if chunks else None, slots=4))
+    elapsed = time.perf_counter() - start
+
+    # 16 runs of 20 ms on 4 slots: 4 rounds, not 16.
+    assert run.peak == 4
+    assert elapsed < 0.2
+
+
+def test_bounded_caps_the_runs_in_flight():
+    run = FakeRun(latency=0.02)
+    limited = bounded(run, 2)
+
+    async def burst():
+        await asyncio.gather(*[limited("select 1", "a.sql") for _ in range(6)])
+
+    asyncio.run(burst())
+
+    assert run.peak == 2
+    # The intended start is taken before queueing for a slot, so the queueing
+    # counts towards the response time of the later runs.
+    assert max(started - intended for _, intended, started in run.calls) >= 0.04
+
+
+def test_bounded_without_a_limit_is_the_run_itself():
+    run = FakeRun()
+
+    assert bounded(run, 0) is run
+
+
+def test_rate_counts_runs_that_raise():
+    run = FakeRun()
+
+    async def flaky(sql: str, file_name: str, intended: float | None = None):
+        if len(run.calls) % 2:
+            run.calls.append((file_name, intended, time.perf_counter()))
+            raise RuntimeError("driver bug")
+        return await run(sql, file_name, intended)
+
+    results = asyncio.run(run_at_rate(flaky, bucket[:1], rate=100, duration=0.1))
+
+    assert results["a.sql"].runs == 5
+    assert results["a.sql"].errors == {"RuntimeError": 5}
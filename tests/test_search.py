@@ -0,0 +1,83 @@
+import queue
+
+import pytest
+
+from src.search import Search, max_probes
+from src.stats import QueryStats, marks, phase_durations, record_run
+
+
+class FakeWorkers:
+    """
+    Stands in for the barrier and the workers behind it: every release runs
+    the published plan at once, on a server that holds p99 at 10 ms up to
+    `capacity` and 1 s beyond it.
+    """
+
+    def __init__(self, search: Search, capacity: float):
+        self.plan = [0.0] * (1 + search.workers)
+        self.results_queue = queue.Queue()
+        self.workers: int = search.workers
+        self.capacity: float = capacity
+
+    @property
+    def channel(self):
+        return self.plan, self.results_queue
+
+    def wait(self):
+        duration = self.plan[0]
+        if duration <= 0:
+            return
+
+        level = sum(self.plan[1:])
+        latency = 0.01 if level <= self.capacity else 1.0
+        for _ in range(self.workers):
+            results: dict[str, QueryStats] = {}
+            for step in range(100):
+                timestamps = {mark: step for mark in marks}
+                timestamps["end"] = step + latency
+                record_run(results, "a.sql", phase_durations(timestamps))
+            self.results_queue.put((results, 0))
+
+
+@pytest.mark.parametrize("capacity", [1, 37, 250])
+def test_concurrency_search_finds_the_knee(capacity):
+    search = Search("concurrency", 0.1, 0.01, 1, 1, 3)
+    workers = FakeWorkers(search, capacity)
+
+    search.control(workers, workers.channel)
+
+    passing = [level for level, _, _, passed in search.probes if passed]
+    failing = [level for level, _, _, passed in search.probes if not passed]
+    # Bracketed to within 5% (or one user) of the capacity.
+    assert max(passing) <= capacity < min(failing)
+    assert min(failing) - max(passing) <= max(1, int(0.05 * max(passing)))
+    assert len(search.probes) <= max_probes
+    # The workers were told to stop.
+    assert workers.plan[0] == 0
+
+
+def test_rate_search_narrows_to_the_resolution():
+    search = Search("rate", 0.1, 0.01, 1, 10, 2)
+    workers = FakeWorkers(search, 333)
+
+    search.control(workers, workers.channel)
+
+    passing = [level for level, _, _, passed in search.probes if passed]
+    failing = [level for level, _, _, passed in search.probes if not passed]
+    assert max(passing) <= 333 < min(failing)
+    assert min(failing) - max(passing) <= 0.05 * max(passing)
+
+
+def test_shares_split_the_level():
+    assert Search("concurrency", 1, 0, 1, 1, 3).shares(8) == [3, 3, 2]
+    assert Search("rate", 1, 0, 1, 1, 4).shares(10) == [2.5] * 4
+
+
+def test_no_passing_level(capsys):
+    search = Search("concurrency", 0.1, 0.01, 1, 1, 1)
+    workers = FakeWorkers(search, 0)
+
+    search.control(workers, workers.channel)
+    search.report()
+
+    assert "No concurrency level met the SLO" in capsys.readouterr().out
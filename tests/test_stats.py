@@ -0,0 +1,174 @@
+import random
+
+import pytest
+
+from src.stats import (
+    Histogram,
+    QueryStats,
+    error_category,
+    mann_whitney,
+    marks,
+    phase_durations,
+    precision,
+    record_run,
+)
+
+
+def histogram(values) -> Histogram:
+    result = Histogram()
+    for value in values:
+        result.record(value)
+    return result
+
+
+def test_percentiles_within_precision():
+    random.seed(1)
+    values = sorted(random.lognormvariate(-4, 1) for _ in range(10_000))
+    recorded = histogram(values)
+
+    for q in (50, 90, 99, 99.9):
+        exact = values[max(int(len(values) * q / 100 + 0.5), 1) - 1]
+        assert abs(recorded.percentile(q) - exact) <= exact * precision * 1.01
+
+
+def test_extremes_and_totals_are_exact():
+    recorded = histogram([0.003, 0.5, 0.0421])
+
+    assert recorded.count == 3
+    assert recorded.minimum == 0.003
+    assert recorded.maximum == 0.5
+    assert recorded.percentile(100) == 0.5
+    assert abs(recorded.percentile(0) - 0.003) <= 0.003 * precision
+    assert abs(recorded.mean - (0.003 + 0.5 + 0.0421) / 3) < 1e-12
+
+
+def test_empty_histogram():
+    assert Histogram().percentile(99) == 0.0
+    assert Histogram().mean == 0.0
+
+
+def test_merge_matches_recording_everything():
+    random.seed(2)
+    a = [random.expovariate(20) for _ in range(1000)]
+    b = [random.expovariate(5) for _ in range(500)]
+
+    merged = histogram(a)
+    merged.merge(histogram(b))
+    whole = histogram(a + b)
+
+    assert merged.counts == whole.counts
+    assert merged.count == whole.count
+    assert merged.minimum == whole.minimum
+    assert merged.maximum == whole.maximum
+    for q in (50, 90, 99):
+        assert merged.percentile(q) == whole.percentile(q)
+
+
+def test_merge_into_empty():
+    merged = Histogram()
+    merged.merge(histogram([0.1, 0.2]))
+
+    assert merged.count == 2
+    assert merged.minimum == 0.1
+
+
+def test_values_outside_the_range_are_clamped():
+    recorded = histogram([0.0, 1e-9, 1e9])
+
+    assert recorded.count == 3
+    assert recorded.percentile(50) == Histogram.value(0)
+    assert recorded.maximum == 1e9
+
+
+def test_mann_whitney_same_distribution():
+    random.seed(3)
+    a = histogram(random.gauss(0.1, 0.01) for _ in range(2000))
+    b = histogram(random.gauss(0.1, 0.01) for _ in range(2000))
+
+    assert mann_whitney(a, b) > 0.01
+
+
+def test_mann_whitney_shifted_distribution():
+    random.seed(4)
+    a = histogram(random.gauss(0.1, 0.01) for _ in range(2000))
+    b = histogram(random.gauss(0.11, 0.01) for _ in range(2000))
+
+    assert mann_whitney(a, b) < 1e-6
+
+
+def test_mann_whitney_is_symmetric():
+    random.seed(5)
+    a = histogram(random.expovariate(10) for _ in range(300))
+    b = histogram(random.expovariate(8) for _ in range(400))
+
+    assert abs(mann_whitney(a, b) - mann_whitney(b, a)) < 1e-12
+
+
+def test_mann_whitney_degenerate_inputs():
+    assert mann_whitney(Histogram(), histogram([0.1])) == 1.0
+    assert mann_whitney(histogram([0.1] * 5), histogram([0.1] * 5)) == 1.0
+
+
+def test_phase_durations():
+    timestamps = dict(zip(marks, (0.0, 0.5, 0.6, 1.0, 1.25, 2.0, 2.5)))
+
+    durations = phase_durations(timestamps)
+
+    assert durations == pytest.approx(
+        {
+            "wait": 0.5,
+            "connect": 0.1,
+            "execute": 0.4,
+            "first_row": 0.25,
+            "fetch": 0.75,
+            "close": 0.5,
+            "total": 2.0,
+            "response": 2.5,
+        }
+    )
+
+
+def test_missing_marks_move_the_time_to_the_next_phase():
+    # No fetch, and no intended start: the run started on time.
+    durations = phase_durations({"start": 1.0, "connected": 1.5, "end": 3.0})
+
+    assert durations["wait"] == 0
+    assert durations["connect"] == 0.5
+    assert durations["execute"] == durations["first_row"] == durations["fetch"] == 0
+    assert durations["close"] == 1.5
+    assert durations["total"] == durations["response"] == 2.0
+
+
+def test_throughput_over_the_runs_window():
+    stats = QueryStats()
+    for finished in (10.0, 10.5, 12.0):
+        durations = phase_durations({"start": finished - 1.0, "end": finished})
+        durations["rows"], durations["bytes"] = 100, 4000
+        stats.record(durations, finished)
+
+    # From the first run's start (9.0) to the last one's end (12.0).
+    assert stats.window == 3.0
+    assert stats.per_second(stats.runs) == 1.0
+    assert stats.per_second(stats.rows) == 100.0
+    assert stats.per_second(stats.bytes) == 4000.0
+    assert QueryStats().per_second(0) == 0.0
+
+
+def test_record_run_counts_errors_apart():
+    results: dict[str, QueryStats] = {}
+    timestamps = {mark: 0.01 * step for step, mark in enumerate(marks)}
+    record_run(results, "a.sql", phase_durations(timestamps))
+    record_run(results, "a.sql", {"error": "timeout"})
+
+    assert results["a.sql"].runs == 1
+    assert results["a.sql"].failed == 1
+    assert results["a.sql"].error_rate == 0.5
+    assert results["a.sql"].errors == {"timeout": 1}
+
+
+def test_error_category():
+    assert error_category({"start": 0, "end": 2.5}, "57014", timeout=2) == "timeout"
+    assert error_category({"start": 0, "end": 0.1}, "OSError", timeout=2) == "connect"
+    assert (
+        error_category({"start": 0, "connected": 0.1, "end": 0.2}, "42P01") == "42P01"
+    )